@@ -0,0 +1,182 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import typing
+
+# Where the cache lives unless another directory is given.
+DEFAULT_CACHE_DIRECTORY = os.path.join(
+    os.path.expanduser("~"), ".cache", "hack-assembler")
+
+# Default bound on the total size of the cached files, in bytes.
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# Size of the blocks in which files are read while hashing them.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str, *salt: str) -> str:
+    """
+    Args:
+        path (str): the file to hash.
+        *salt (str): strings that are hashed before the content of the file.
+
+    Returns:
+        str: the hex SHA-256 digest of the salt and the content of the file.
+    """
+    digest = hashlib.sha256()
+    for part in salt:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    An on-disk cache of build outputs. Every entry is a single file named
+    after its key, which should be a digest of everything the output depends
+    on. The least recently used entries are evicted once the total size of
+    the cache goes over its bound.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIRECTORY,
+                 max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        """
+        Args:
+            directory (str): the directory of the cache, created on demand.
+            max_size (int): bound on the total size of the entries, in bytes.
+        """
+        self.directory = directory
+        self.max_size = max_size
+
+    def entry_path(self, key: str) -> str:
+        """
+        Args:
+            key (str): the key of an entry.
+
+        Returns:
+            str: the path of the entry.
+        """
+        return os.path.join(self.directory, key)
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copies a cached entry to output_path, if there is one.
+
+        Args:
+            key (str): the key of the entry.
+            output_path (str): where to copy the entry.
+
+        Returns:
+            bool: True on a hit, False on a miss.
+        """
+        entry_path = self.entry_path(key)
+        try:
+            shutil.copyfile(entry_path, output_path)
+            # the modification time is the last use of the entry
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """Adds a copy of output_path to the cache. The entry is written to
+        a temporary file first and renamed, so concurrent builds never see a
+        partial entry.
+
+        Args:
+            key (str): the key of the entry.
+            output_path (str): the file to cache.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.directory, prefix=".tmp")
+        os.close(file_descriptor)
+        try:
+            shutil.copyfile(output_path, temporary_path)
+            os.replace(temporary_path, self.entry_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def fetch_text(self, key: str) -> typing.Optional[str]:
+        """
+        Args:
+            key (str): the key of an entry stored by store_text.
+
+        Returns:
+            typing.Optional[str]: the text of the entry, None on a miss.
+        """
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'r') as entry:
+                text = entry.read()
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return text
+
+    def store_text(self, key: str, text: str) -> None:
+        """Adds an entry that holds text, like the notes of a build, written
+        through a temporary file like store does.
+
+        Args:
+            key (str): the key of the entry.
+            text (str): the content of the entry.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.directory, prefix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, 'w') as entry:
+                entry.write(text)
+            os.replace(temporary_path, self.entry_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def entries(self) -> typing.List[os.DirEntry]:
+        """
+        Returns:
+            typing.List[os.DirEntry]: the entries of the cache, least recently
+            used first.
+        """
+        try:
+            with os.scandir(self.directory) as scan:
+                entries = [entry for entry in scan
+                           if entry.is_file() and
+                           not entry.name.startswith(".tmp")]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime)
+
+    def evict(self) -> int:
+        """Removes the least recently used entries until the cache fits in
+        its bound.
+
+        Returns:
+            int: the number of removed entries.
+        """
+        entries = self.entries()
+        total_size = sum(entry.stat().st_size for entry in entries)
+        removed = 0
+        for entry in entries:
+            if total_size <= self.max_size:
+                break
+            total_size -= entry.stat().st_size
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                # already evicted by a concurrent build
+                continue
+            removed += 1
+        return removed
@@ -56,9 +56,30 @@ comp_table = {
     "M-D": "1000111",
     "D&A": "0000000",
     "D&M": "1000000",
-    "D|A": "0010101"
+    "D|A": "0010101",
+    "D|M": "1010101",
+    # the same operations with their operands swapped
+    "A+D": "0000010",
+    "M+D": "1000010",
+    "A&D": "0000000",
+    "M&D": "1000000",
+    "A|D": "0010101",
+    "M|D": "1010101"
 }
 
+# Comp field of the CpuMul shift instructions, which start with "101".
+shift_table = {
+    "A<<": "0100000",
+    "D<<": "0110000",
+    "M<<": "1100000",
+    "A>>": "0000000",
+    "D>>": "0010000",
+    "M>>": "1000000"
+}
+
+# Binary code of every A-instruction, indexed by its 15-bit value.
+a_instruction_table = [format(value, "016b") for value in range(32768)]
+
 
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
@@ -98,3 +119,66 @@ class Code:
         """
         # Your code goes here!
         return jmp_table[mnemonic] if mnemonic in jmp_table else "111"
+
+    @staticmethod
+    def a_instruction(value: int) -> str:
+        """
+        Args:
+            value (int): the non-negative value of an A-instruction.
+
+        Returns:
+            str: the binary code of the A-instruction.
+        """
+        if value < 32768:
+            return a_instruction_table[value]
+        return bin(value)[2:].zfill(16)
+
+    @staticmethod
+    def c_instruction(command: str) -> str:
+        """
+        Args:
+            command (str): a C-instruction without whitespace, for example
+            "AM=M+1", "0;JMP" or "D=D<<".
+
+        Returns:
+            str: the binary code of the C-instruction, taken from
+            c_instruction_table.
+        """
+        return c_instruction_table[command]
+
+    @staticmethod
+    def encode_c_instruction(command: str) -> str:
+        """Encodes a C-instruction without consulting c_instruction_table.
+
+        Args:
+            command (str): a C-instruction without whitespace.
+
+        Returns:
+            str: the binary code of the C-instruction.
+        """
+        equal_index = command.find('=')
+        semicolon_index = command.find(';')
+        dest = "null" if equal_index == -1 else command[:equal_index]
+        if semicolon_index == -1:
+            comp = command[equal_index + 1:]
+            jump = "null"
+        else:
+            comp = command[equal_index + 1:semicolon_index]
+            jump = command[semicolon_index + 1:]
+        if comp in shift_table:
+            return "101" + shift_table[comp] + Code.dest(dest) + \
+                Code.jump(jump)
+        return "111" + Code.comp(comp) + Code.dest(dest) + Code.jump(jump)
+
+
+class CInstructionTable(dict):
+    """Maps C-instruction texts to their binary code, encoding every distinct
+    text only the first time it is looked up."""
+
+    def __missing__(self, command: str) -> str:
+        word = Code.encode_c_instruction(command)
+        self[command] = word
+        return word
+
+
+c_instruction_table = CInstructionTable()
@@ -0,0 +1,267 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import sys
+import typing
+from array import array
+
+# File extension of each supported ROM image format:
+# "hack" - one 16-character binary string per line, as the CPU emulator reads.
+# "bin" - a packed image of little-endian unsigned 16-bit words.
+# "hex" - the packed image in Intel-HEX records.
+FORMAT_EXTENSIONS = {"hack": ".hack", "bin": ".bin", "hex": ".hex"}
+
+# Formats whose files have to be opened in binary mode.
+BINARY_FORMATS = {"bin"}
+
+# Number of data bytes in a single Intel-HEX record.
+HEX_RECORD_SIZE = 16
+
+# Number of instructions ImageWriter buffers before writing them out. It is a
+# multiple of the words in an Intel-HEX record, so only the last one is short.
+CHUNK_SIZE = 8192
+
+
+def format_of(path: str) -> str:
+    """
+    Args:
+        path (str): a path of a ROM image.
+
+    Returns:
+        str: the format of the image, guessed from the extension of the path.
+    """
+    extension = path[path.rfind('.'):].lower() if '.' in path else ""
+    for image_format, format_extension in FORMAT_EXTENSIONS.items():
+        if extension == format_extension:
+            return image_format
+    raise ValueError("unknown ROM image extension: " + path)
+
+
+def to_words(instructions: typing.Iterable[str],
+             first_address: int = 0) -> array:
+    """
+    Args:
+        instructions (typing.Iterable[str]): binary strings of instructions.
+        first_address (int): ROM address of the first instruction, only used
+            in error messages.
+
+    Returns:
+        array: the instructions as unsigned 16-bit words.
+    """
+    words = array('H')
+    for address, instruction in enumerate(instructions, first_address):
+        value = int(instruction, 2)
+        if value > 0xFFFF:
+            raise ValueError(
+                "instruction {} ({}) does not fit in 16 bits, the program "
+                "is probably larger than the ROM".format(address, instruction))
+        words.append(value)
+    return words
+
+
+def to_little_endian(words: array) -> bytes:
+    """
+    Args:
+        words (array): unsigned 16-bit words.
+
+    Returns:
+        bytes: the words packed as little-endian bytes.
+    """
+    if sys.byteorder == "big":
+        words = array('H', words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def write_image(instructions: typing.Iterable[str], output_file: typing.IO,
+                image_format: str = "hack") -> int:
+    """Writes assembled instructions as a ROM image.
+
+    Args:
+        instructions (typing.Iterable[str]): binary strings of the
+            instructions.
+        output_file (typing.IO): the image is written to this file, which is
+            opened in binary mode for the formats in BINARY_FORMATS.
+        image_format (str): one of the keys of FORMAT_EXTENSIONS.
+
+    Returns:
+        int: the number of bytes written.
+    """
+    writer = ImageWriter(output_file, image_format)
+    for instruction in instructions:
+        writer.write(instruction)
+    writer.close()
+    return writer.bytes_written
+
+
+class ImageWriter:
+    """Writes a ROM image one instruction at a time. Instructions are
+    buffered and written out in chunks of CHUNK_SIZE, so the whole program is
+    never held in memory.
+    """
+
+    def __init__(self, output_file: typing.IO,
+                 image_format: str = "hack") -> None:
+        """
+        Args:
+            output_file (typing.IO): the image is written to this file, which
+                is opened in binary mode for the formats in BINARY_FORMATS.
+            image_format (str): one of the keys of FORMAT_EXTENSIONS.
+        """
+        if image_format not in FORMAT_EXTENSIONS:
+            raise ValueError("unknown ROM image format: " + image_format)
+        self.output_file = output_file
+        self.image_format = image_format
+        self.chunk = []
+        # ROM address of the first instruction in chunk
+        self.address = 0
+        self.bytes_written = 0
+
+    def write(self, instruction: str) -> None:
+        """
+        Args:
+            instruction (str): binary string of the next instruction.
+        """
+        self.chunk.append(instruction)
+        if len(self.chunk) == CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered instructions to the output file."""
+        chunk = self.chunk
+        if not chunk:
+            return
+        if self.image_format == "hack":
+            text = '\n'.join(chunk)
+            self.output_file.write(text)
+            self.output_file.write('\n')
+            self.bytes_written += len(text) + 1
+        else:
+            data = to_little_endian(to_words(chunk, self.address))
+            if self.image_format == "bin":
+                self.output_file.write(data)
+                self.bytes_written += len(data)
+            else:
+                self.bytes_written += write_intel_hex(
+                    data, self.output_file, 2 * self.address)
+        self.address += len(chunk)
+        self.chunk = []
+
+    def close(self) -> None:
+        """Writes the rest of the image. The output file is left open."""
+        self.flush()
+        if self.image_format == "hex":
+            record = hex_record(0, 1, b"")
+            self.output_file.write(record)
+            self.output_file.write('\n')
+            self.bytes_written += len(record) + 1
+
+
+def write_intel_hex(data: bytes, output_file: typing.TextIO,
+                    first_offset: int = 0) -> int:
+    """Writes bytes as Intel-HEX data records. The end of file record is not
+    written.
+
+    Args:
+        data (bytes): the bytes to write.
+        output_file (typing.TextIO): writes all records to this file.
+        first_offset (int): the byte address of the first byte of data.
+
+    Returns:
+        int: the number of characters written.
+    """
+    records = []
+    for offset in range(first_offset, first_offset + len(data),
+                        HEX_RECORD_SIZE):
+        if offset and offset % 0x10000 == 0:
+            # extended linear address record for the next 64K bytes
+            records.append(hex_record(0, 4, (offset >> 16).to_bytes(2, "big")))
+        start = offset - first_offset
+        records.append(hex_record(
+            offset & 0xFFFF, 0, data[start:start + HEX_RECORD_SIZE]))
+    if not records:
+        return 0
+    text = '\n'.join(records)
+    output_file.write(text)
+    output_file.write('\n')
+    return len(text) + 1
+
+
+def hex_record(address: int, record_type: int, data: bytes) -> str:
+    """
+    Args:
+        address (int): the 16-bit address field of the record.
+        record_type (int): the Intel-HEX record type.
+        data (bytes): the data field of the record.
+
+    Returns:
+        str: the record, including the leading colon and the checksum.
+    """
+    record = bytes([len(data), address >> 8, address & 0xFF, record_type])
+    record += data
+    checksum = -sum(record) & 0xFF
+    return ':' + record.hex().upper() + format(checksum, "02X")
+
+
+def read_image(input_file: typing.IO, image_format: str = "hack") -> array:
+    """Loads a ROM image.
+
+    Args:
+        input_file (typing.IO): the image to load, opened in binary mode for
+            the formats in BINARY_FORMATS.
+        image_format (str): one of the keys of FORMAT_EXTENSIONS.
+
+    Returns:
+        array: the instructions of the image as unsigned 16-bit words.
+    """
+    if image_format == "hack":
+        return to_words(
+            line.strip() for line in input_file if not line.isspace())
+    if image_format == "bin":
+        data = input_file.read()
+    elif image_format == "hex":
+        data = read_intel_hex(input_file)
+    else:
+        raise ValueError("unknown ROM image format: " + image_format)
+    words = array('H')
+    words.frombytes(data)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def read_intel_hex(input_file: typing.TextIO) -> bytes:
+    """
+    Args:
+        input_file (typing.TextIO): Intel-HEX records.
+
+    Returns:
+        bytes: the data of the records, with gaps filled by zeros.
+    """
+    data = bytearray()
+    base_address = 0
+    for line in input_file:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(':'):
+            raise ValueError("invalid Intel-HEX record: " + line)
+        record = bytes.fromhex(line[1:])
+        if sum(record) & 0xFF:
+            raise ValueError("bad Intel-HEX checksum: " + line)
+        length, record_type = record[0], record[3]
+        payload = record[4:4 + length]
+        if record_type == 0:
+            address = base_address + (record[1] << 8 | record[2])
+            if len(data) < address:
+                data.extend(bytes(address - len(data)))
+            data[address:address + length] = payload
+        elif record_type == 1:
+            break
+        elif record_type == 4:
+            base_address = int.from_bytes(payload, "big") << 16
+    return bytes(data)
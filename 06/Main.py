@@ -1,120 +1,579 @@
-"""
-This file is part of nand2tetris, as taught in The Hebrew University, and
-was written by Aviv Yaish. It is an extension to the specifications given
-[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
-as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
-Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
-"""
-import os
-import sys
-import typing
-from SymbolTable import SymbolTable
-from Parser import Parser
-from Code import Code
-
-
-def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Assembles a single file.
-
-    Args:
-        input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
-    """
-    # Your code goes here!
-    # A good place to start is to initialize a new Parser object:
-    # parser = Parser(input_file)
-    # Note that you can write to output_file like so:
-    # output_file.write("Hello world! \n")
-
-    parser = Parser(input_file)
-    sym_table = SymbolTable()
-    label_exist_counter = 0
-
-    # loop until get rid of L commands  (first pass)
-    while parser.has_more_commands():
-        parser.current_line_index += 1
-        parser.advance()
-        if parser.current_command is not None:
-            if parser.command_type() == "L_COMMAND":
-                sym_table.add_entry(parser.symbol(), parser.current_line_index - label_exist_counter)
-                label_exist_counter += 1
-
-    # loop to fill the sym_table
-
-    parser.current_line_index = -1
-
-    while parser.has_more_commands():
-        parser.current_line_index += 1
-        parser.advance()
-        if parser.current_command is not None:
-            if parser.command_type() == "A_COMMAND":
-                # handle numbers :
-                if parser.symbol().isnumeric():
-                    bin_num = bin(int(parser.symbol()))[2:].zfill(16)
-                    output_file.write(bin_num)
-                    output_file.write('\n')
-                else:
-                    if not sym_table.contains(parser.symbol()):
-                        sym_table.add_entry(parser.symbol(), sym_table.sym_index)
-                        sym_table.sym_index += 1
-                    bin_num = bin(sym_table.get_address(parser.symbol()))[2:].zfill(16)
-                    output_file.write(bin_num)
-                    output_file.write('\n')
-
-            elif parser.command_type() == "C_COMMAND":
-                code = Code
-                bin_num = is_shift_command(parser.current_command)
-                if bin_num != "":
-                    output_file.write(bin_num)
-                    output_file.write('\n')
-                    continue
-                bin_num = "111"
-                bin_num += code.comp(parser.comp())
-                bin_num += code.dest(parser.dest())
-                bin_num += code.jump(parser.jump())
-                output_file.write(bin_num)
-                output_file.write('\n')
-
-    output_file.close()
-
-
-def is_shift_command(command):
-    if command == "D=D>>":
-        return "1010010000010000"
-    elif command == "D=D<<":
-        return "1010110000010000"
-    elif command == "D=A>>":
-        return "1010000000010000"
-    elif command == "D=A<<":
-        return "1010100000010000"
-    elif command == "D=M>>":
-        return "1011000000010000"
-    elif command == "D=M<<":
-        return "1011100000010000"
-    return ""
-
-
-if "__main__" == __name__:
-    # Parses the input path and calls assemble_file on each input file.
-    # This opens both the input and the output files!
-    # Both are closed automatically when the code finishes running.
-    # If the output file does not exist, it is created automatically in the
-    # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
-    if os.path.isdir(argument_path):
-        files_to_assemble = [
-            os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
-    else:
-        files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import contextlib
+import functools
+import hashlib
+import json
+import mmap
+import os
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from BuildCache import BuildCache, file_digest, DEFAULT_CACHE_DIRECTORY, \
+    DEFAULT_CACHE_SIZE
+from Stats import Stats, write_report
+from SymbolTable import SymbolTable
+from Parser import Parser, A_COMMAND, C_COMMAND, L_COMMAND
+from Peephole import Peephole
+from Code import Code, a_instruction_table, c_instruction_table
+from HackImage import ImageWriter, write_image, FORMAT_EXTENSIONS, \
+    BINARY_FORMATS
+
+
+def assemble_file(
+        input_file: typing.TextIO, output_file: typing.IO,
+        image_format: str = "hack",
+        stats: typing.Optional[Stats] = None,
+        peephole: typing.Optional[Peephole] = None) -> None:
+    """Assembles a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.IO): writes all output to this file.
+        image_format (str): the format of the output, one of the keys of
+            HackImage.FORMAT_EXTENSIONS.
+        stats (typing.Optional[Stats]): if given, collects the time of the
+            parse, label pass and emit phases and the build counters.
+        peephole (typing.Optional[Peephole]): if given, optimizes the parsed
+            commands before they are assembled.
+    """
+    # Your code goes here!
+    # A good place to start is to initialize a new Parser object:
+    # parser = Parser(input_file)
+    # Note that you can write to output_file like so:
+    # output_file.write("Hello world! \n")
+
+    if stats is not None:
+        stats.start("parse")
+    parser = Parser(input_file)
+    optimize_commands(parser, peephole, stats)
+    sym_table = SymbolTable()
+    first_variable = sym_table.sym_index
+    kinds, symbols, values = parser.kinds, parser.symbols, parser.values
+    commands = parser.input_lines
+    a_words, c_words = a_instruction_table, c_instruction_table
+    words = []
+
+    # record the address of every label (first pass)
+    if stats is not None:
+        stats.start("label_pass")
+    address = 0
+    for kind, symbol in zip(kinds, symbols):
+        if kind == L_COMMAND:
+            sym_table.add_entry(symbol, address)
+        else:
+            address += 1
+
+    # emit the instructions and allocate the variables (second pass)
+    if stats is not None:
+        stats.start("emit")
+    for index, kind in enumerate(kinds):
+        if kind == A_COMMAND:
+            value = values[index]
+            # numbers already have a value, symbols are looked up
+            if value is None:
+                symbol = symbols[index]
+                if not sym_table.contains(symbol):
+                    sym_table.add_entry(symbol, sym_table.sym_index)
+                    sym_table.sym_index += 1
+                value = sym_table.get_address(symbol)
+            words.append(a_words[value] if value < 32768
+                         else Code.a_instruction(value))
+
+        elif kind == C_COMMAND:
+            words.append(c_words[commands[index]])
+
+    bytes_written = write_image(words, output_file, image_format)
+    output_file.close()
+    if stats is not None:
+        stats.end()
+        count_commands(stats, kinds)
+        stats.count("variables", sym_table.sym_index - first_variable)
+        stats.count("bytes_written", bytes_written)
+
+
+def optimize_commands(parser: Parser, peephole: typing.Optional[Peephole],
+                      stats: typing.Optional[Stats]) -> None:
+    """Runs the peephole optimizer, if any, on a parsed file.
+
+    Args:
+        parser (Parser): the parser of the file.
+        peephole (typing.Optional[Peephole]): the optimizer.
+        stats (typing.Optional[Stats]): if given, collects the time of the
+            optimize phase and the instructions removed by each rule.
+    """
+    if peephole is None:
+        return
+    if stats is not None:
+        stats.start("optimize")
+    peephole.optimize(parser)
+    if stats is not None:
+        stats.count("peephole_words_saved",
+                    peephole.words_before - peephole.words_after)
+        stats.count("peephole_threaded_jumps", peephole.threaded_jumps)
+        stats.count("peephole_removed_labels", peephole.removed_labels)
+        for rule, amount in peephole.removed.items():
+            stats.count("peephole_" + rule, amount)
+
+
+def count_commands(stats: Stats, kinds: typing.List[int]) -> None:
+    """Counts the parsed commands by kind.
+
+    Args:
+        stats (Stats): receives the counts.
+        kinds (typing.List[int]): the Parser.kinds of a file.
+    """
+    a_instructions = kinds.count(A_COMMAND)
+    c_instructions = kinds.count(C_COMMAND)
+    stats.count("a_instructions", a_instructions)
+    stats.count("c_instructions", c_instructions)
+    stats.count("instructions", a_instructions + c_instructions)
+    stats.count("labels", kinds.count(L_COMMAND))
+
+
+def assemble_file_single_pass(
+        input_file: typing.TextIO, output_file: typing.IO,
+        image_format: str = "hack",
+        stats: typing.Optional[Stats] = None,
+        peephole: typing.Optional[Peephole] = None) -> None:
+    """Assembles a single file, walking over its commands only once.
+
+    A-instructions that reference a symbol which is not known yet are emitted
+    as placeholders and patched when the matching label is defined. Symbols
+    that are still unresolved at the end of the file are variables, and they
+    are allocated in order of first use, so the output is identical to the
+    one of assemble_file. Labels are assumed to be defined only once and to
+    not shadow a predefined symbol.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.IO): writes all output to this file.
+        image_format (str): the format of the output, one of the keys of
+            HackImage.FORMAT_EXTENSIONS.
+        stats (typing.Optional[Stats]): if given, collects the time of the
+            parse and emit phases and the build counters.
+        peephole (typing.Optional[Peephole]): if given, optimizes the parsed
+            commands before they are assembled.
+    """
+    if stats is not None:
+        stats.start("parse")
+    parser = Parser(input_file)
+    optimize_commands(parser, peephole, stats)
+    sym_table = SymbolTable()
+    first_variable = sym_table.sym_index
+    kinds, symbols, values = parser.kinds, parser.symbols, parser.values
+    commands = parser.input_lines
+    c_words = c_instruction_table
+    words = []
+    # symbol -> indices in words of the A-instructions waiting for it
+    pending = {}
+    # address of the next instruction, labels are not counted
+    address = 0
+
+    if stats is not None:
+        stats.start("emit")
+    for index, kind in enumerate(kinds):
+        if kind == A_COMMAND:
+            value = values[index]
+            symbol = symbols[index]
+            if value is not None:
+                words.append(Code.a_instruction(value))
+            elif symbol in pending:
+                pending[symbol].append(len(words))
+                words.append(None)
+            elif sym_table.contains(symbol):
+                words.append(
+                    Code.a_instruction(sym_table.get_address(symbol)))
+            else:
+                pending[symbol] = [len(words)]
+                words.append(None)
+        elif kind == C_COMMAND:
+            words.append(c_words[commands[index]])
+        elif kind == L_COMMAND:
+            label = symbols[index]
+            sym_table.add_entry(label, address)
+            label_address = Code.a_instruction(address)
+            for pending_index in pending.pop(label, ()):
+                words[pending_index] = label_address
+            continue
+        address += 1
+
+    # whatever is still pending was never defined as a label
+    for symbol, indices in pending.items():
+        sym_table.add_entry(symbol, sym_table.sym_index)
+        variable_address = Code.a_instruction(sym_table.sym_index)
+        sym_table.sym_index += 1
+        for index in indices:
+            words[index] = variable_address
+
+    bytes_written = write_image(words, output_file, image_format)
+    output_file.close()
+    if stats is not None:
+        stats.end()
+        count_commands(stats, kinds)
+        stats.count("variables", sym_table.sym_index - first_variable)
+        stats.count("bytes_written", bytes_written)
+
+
+def assemble_file_streaming(
+        input_file: typing.BinaryIO, output_file: typing.IO,
+        image_format: str = "hack",
+        stats: typing.Optional[Stats] = None) -> None:
+    """Assembles a single file without ever holding all of it in memory.
+
+    The source is memory-mapped and read line by line, twice. The first pass
+    only records label addresses, and the second pass writes every encoded
+    instruction straight to the output through an ImageWriter. Lines are
+    cleaned up exactly like the Parser does, so the output is identical to
+    the one of assemble_file.
+
+    Args:
+        input_file (typing.BinaryIO): the file to assemble, opened in binary
+            mode.
+        output_file (typing.IO): writes all output to this file.
+        image_format (str): the format of the output, one of the keys of
+            HackImage.FORMAT_EXTENSIONS.
+        stats (typing.Optional[Stats]): if given, collects the time of the
+            label pass and emit phases, which include reading the source,
+            and the build counters.
+    """
+    sym_table = SymbolTable()
+    first_variable = sym_table.sym_index
+    a_words, c_words = a_instruction_table, c_instruction_table
+    writer = ImageWriter(output_file, image_format)
+    if os.fstat(input_file.fileno()).st_size == 0:
+        # an empty file cannot be mapped
+        writer.close()
+        output_file.close()
+        return
+
+    with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        # record the address of every label (first pass)
+        if stats is not None:
+            stats.start("label_pass")
+        address = 0
+        for command in stream_commands(source):
+            if '@' in command or '=' in command or ';' in command \
+                    or not ('(' in command and ')' in command):
+                address += 1
+            else:
+                sym_table.add_entry(
+                    command.replace('(', '').replace(')', ''), address)
+
+        # emit the instructions and allocate the variables (second pass)
+        if stats is not None:
+            labels = len(sym_table.sym_table)
+            stats.start("emit")
+        source.seek(0)
+        for command in stream_commands(source):
+            if '@' in command:
+                symbol = command[1:]
+                if symbol.isnumeric():
+                    value = int(symbol)
+                else:
+                    if not sym_table.contains(symbol):
+                        sym_table.add_entry(symbol, sym_table.sym_index)
+                        sym_table.sym_index += 1
+                    value = sym_table.get_address(symbol)
+                writer.write(a_words[value] if value < 32768
+                             else Code.a_instruction(value))
+            elif '=' in command or ';' in command:
+                writer.write(c_words[command])
+
+    writer.close()
+    output_file.close()
+    if stats is not None:
+        stats.end()
+        variables = sym_table.sym_index - first_variable
+        stats.count("instructions", writer.address)
+        stats.count("labels", labels - len(SymbolTable().sym_table))
+        stats.count("variables", variables)
+        stats.count("bytes_written", writer.bytes_written)
+
+
+def stream_commands(source: mmap.mmap) -> typing.Iterator[str]:
+    """Yields the non-empty lines of a memory-mapped source, from its current
+    position, with comments and spaces removed.
+
+    Args:
+        source (mmap.mmap): the memory-mapped source.
+    """
+    for line in iter(source.readline, b""):
+        command = line.rstrip(b"\r\n").split(b"//", 1)[0].replace(b" ", b"")
+        if command:
+            yield command.decode()
+
+
+# The available assemblers, by the name of their mode.
+ASSEMBLY_MODES = {
+    "two-pass": assemble_file,
+    "single-pass": assemble_file_single_pass,
+    "streaming": assemble_file_streaming,
+}
+
+
+def assembler_version() -> str:
+    """
+    Returns:
+        str: a digest of the sources of the assembler, so that build cache
+        entries made by a different version of it are never used.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for source in ASSEMBLER_SOURCES:
+        with open(os.path.join(directory, source), 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+# The modules that determine the assembled output.
+ASSEMBLER_SOURCES = (
+    "Main.py", "Parser.py", "Peephole.py", "Code.py", "SymbolTable.py",
+    "HackImage.py")
+
+ASSEMBLER_VERSION = assembler_version()
+
+# Suffix of the cache entry next to every cached image that holds what the
+# build printed and counted, so a cache hit reports the same.
+NOTES_SUFFIX = ".notes"
+
+
+def assemble_path(input_path: str, output_path: str,
+                  image_format: str = "hack", mode: str = "two-pass",
+                  cache: typing.Optional[BuildCache] = None,
+                  stats: typing.Optional[Stats] = None,
+                  optimize: bool = False) -> bool:
+    """Opens the given paths and assembles one file. This is the unit of work
+    of the worker processes in assemble_files.
+
+    Args:
+        input_path (str): path of the .asm file to assemble.
+        output_path (str): path of the image to write.
+        image_format (str): the format of the image, one of the keys of
+            HackImage.FORMAT_EXTENSIONS.
+        mode (str): the assembler to use, one of the keys of ASSEMBLY_MODES.
+        cache (typing.Optional[BuildCache]): if given, an image built earlier
+            from the same source by the same assembler is copied instead of
+            assembling the file again.
+        stats (typing.Optional[Stats]): if given, collects the statistics of
+            the build.
+        optimize (bool): run the peephole optimizer and print how many ROM
+            words it saved. Not supported by the streaming mode, which never
+            holds the whole program.
+
+    Returns:
+        bool: True if the image was taken from the cache.
+    """
+    if optimize and mode == "streaming":
+        raise ValueError("the streaming assembler cannot optimize")
+    if cache is not None:
+        if stats is not None:
+            stats.start("cache_fetch")
+        key = file_digest(input_path, ASSEMBLER_VERSION, image_format,
+                          "optimize" if optimize else "")
+        if cache.fetch(key, output_path):
+            notes = cache.fetch_text(key + NOTES_SUFFIX)
+            notes = json.loads(notes) if notes is not None else {}
+            if stats is not None:
+                stats.count("cache_hits")
+                for counter, amount in notes.get("counters", {}).items():
+                    stats.count(counter, amount)
+            if optimize:
+                print(input_path + notes.get("summary", ": optimized") +
+                      " (from the cache)")
+            return True
+    assemble = ASSEMBLY_MODES[mode]
+    input_mode = 'rb' if mode == "streaming" else 'r'
+    output_mode = 'wb' if image_format in BINARY_FORMATS else 'w'
+    peephole = Peephole() if optimize else None
+    with open(input_path, input_mode) as input_file, \
+            open(output_path, output_mode) as output_file:
+        if peephole is None:
+            assemble(input_file, output_file, image_format, stats)
+        else:
+            assemble(input_file, output_file, image_format, stats, peephole)
+            print(peephole.summary(input_path))
+    if cache is not None:
+        cache.store(key, output_path)
+        notes = {}
+        if peephole is not None:
+            # without the name, the same source may be at another path
+            notes["summary"] = peephole.summary("")
+        if stats is not None:
+            notes["counters"] = stats.counters
+        if notes:
+            cache.store_text(key + NOTES_SUFFIX, json.dumps(notes))
+    return False
+
+
+def assemble_job(input_path: str, output_path: str, image_format: str,
+                 mode: str, cache: typing.Optional[BuildCache],
+                 collect_stats: bool,
+                 optimize: bool = False) -> typing.Tuple[bool, Stats]:
+    """Runs assemble_path in a worker process and sends its statistics back.
+
+    Returns:
+        typing.Tuple[bool, Stats]: whether the image came from the cache, and
+        the statistics of the build, or None if collect_stats is False.
+    """
+    stats = Stats() if collect_stats else None
+    cached = assemble_path(input_path, output_path, image_format, mode,
+                           cache, stats, optimize)
+    return cached, stats
+
+
+def assemble_files(
+        paths: typing.List[typing.Tuple[str, str]], jobs: int,
+        image_format: str = "hack", mode: str = "two-pass",
+        cache: typing.Optional[BuildCache] = None,
+        stats_by_file: typing.Optional[typing.Dict[str, Stats]] = None,
+        optimize: bool = False) -> int:
+    """Assembles independent files, in a pool of worker processes when
+    there are more than one of both, or one after the other in this process.
+    Either way, a file that fails to assemble does not stop the others, its
+    error is reported in the summary printed at the end.
+
+    Args:
+        paths (typing.List[typing.Tuple[str, str]]): (input path, output
+            path) pairs to pass to assemble_path.
+        jobs (int): the number of worker processes, 1 to assemble in this
+            process.
+        image_format (str): the format of the images.
+        mode (str): the assembler to use, one of the keys of ASSEMBLY_MODES.
+        cache (typing.Optional[BuildCache]): the build cache, if any.
+        stats_by_file (typing.Optional[typing.Dict[str, Stats]]): if given,
+            the statistics of every assembled file are stored in it, by
+            input path.
+        optimize (bool): run the peephole optimizer on every file.
+
+    Returns:
+        int: the number of files that failed.
+    """
+    failures = {}
+    cached = 0
+    parallel = jobs > 1 and len(paths) > 1
+    with ProcessPoolExecutor(max_workers=jobs) if parallel \
+            else contextlib.nullcontext() as executor:
+        # (input path, a function that returns what assemble_job returns)
+        if executor is None:
+            outcomes = (
+                (input_path, functools.partial(
+                    assemble_job, input_path, output_path, image_format,
+                    mode, cache, stats_by_file is not None, optimize))
+                for input_path, output_path in paths)
+        else:
+            futures = {
+                executor.submit(assemble_job, input_path, output_path,
+                                image_format, mode, cache,
+                                stats_by_file is not None, optimize):
+                    input_path
+                for input_path, output_path in paths}
+            outcomes = ((futures[future], future.result)
+                        for future in as_completed(futures))
+        for input_path, result in outcomes:
+            try:
+                from_cache, stats = result()
+            except Exception as error:
+                failures[input_path] = error
+                continue
+            cached += from_cache
+            if stats_by_file is not None:
+                stats_by_file[input_path] = stats
+    for input_path in sorted(failures):
+        error = failures[input_path]
+        print("{}: {}: {}".format(input_path, type(error).__name__, error),
+              file=sys.stderr)
+    print("Assembled {} of {} files with {} jobs ({} from the cache), "
+          "{} failed".format(len(paths) - len(failures), len(paths), jobs,
+                             cached, len(failures)))
+    return len(failures)
+
+
+if "__main__" == __name__:
+    # Parses the input path and calls assemble_file on each input file.
+    # This opens both the input and the output files!
+    # Both are closed automatically when the code finishes running.
+    # If the output file does not exist, it is created automatically in the
+    # correct path, using the correct filename.
+    arg_parser = argparse.ArgumentParser(prog="Assembler")
+    arg_parser.add_argument("input_path", help="an .asm file or a directory")
+    mode_group = arg_parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--single-pass", dest="mode", action="store_const",
+        const="single-pass", default="two-pass",
+        help="resolve forward label references by backpatching instead of "
+             "running a separate label pass")
+    mode_group.add_argument(
+        "--streaming", dest="mode", action="store_const", const="streaming",
+        help="memory-map the source and stream the output, so memory use "
+             "does not grow with the size of the file")
+    arg_parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="number of files to assemble at once, 0 uses every CPU "
+             "(default: 1)")
+    cache_group = arg_parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--cache", dest="cache", action="store_true", default=False,
+        help="reuse images assembled earlier from the same source, kept in "
+             "the --cache-dir directory (off by default)")
+    cache_group.add_argument(
+        "--no-cache", dest="cache", action="store_false",
+        help="always assemble, without reading or updating the build cache "
+             "(the default)")
+    arg_parser.add_argument(
+        "--cache-dir", default=DEFAULT_CACHE_DIRECTORY,
+        help="directory of the build cache with --cache (default: "
+             "%(default)s)")
+    arg_parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+        help="bound on the size of the build cache in MB, least recently "
+             "used images are evicted beyond it (default: %(default)s)")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="print per-phase times and counters as JSON")
+    arg_parser.add_argument(
+        "--stats-file", metavar="PATH",
+        help="write the --stats report to PATH instead of printing it")
+    arg_parser.add_argument(
+        "--optimize", "-O", action="store_true",
+        help="remove redundant instructions and dead code before assembling "
+             "and report the ROM words saved (not with --streaming)")
+    arg_parser.add_argument(
+        "--format", choices=FORMAT_EXTENSIONS, default="hack",
+        help="hack: text with one binary word per line (default), "
+             "bin: packed little-endian 16-bit words, hex: Intel-HEX")
+    args = arg_parser.parse_args()
+    if args.optimize and args.mode == "streaming":
+        arg_parser.error("--optimize cannot be used with --streaming")
+    argument_path = os.path.abspath(args.input_path)
+    if os.path.isdir(argument_path):
+        files_to_assemble = [
+            os.path.join(argument_path, filename)
+            for filename in sorted(os.listdir(argument_path))]
+    else:
+        files_to_assemble = [argument_path]
+    paths_to_assemble = []
+    for input_path in files_to_assemble:
+        filename, extension = os.path.splitext(input_path)
+        if extension.lower() != ".asm":
+            continue
+        output_path = filename + FORMAT_EXTENSIONS[args.format]
+        paths_to_assemble.append((input_path, output_path))
+    cache = BuildCache(args.cache_dir, args.cache_size * 1024 * 1024) \
+        if args.cache else None
+    stats_by_file = {} if args.stats or args.stats_file else None
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    failed = assemble_files(paths_to_assemble, jobs, args.format, args.mode,
+                            cache, stats_by_file, args.optimize)
+    if cache is not None:
+        cache.evict()
+    if stats_by_file is not None:
+        write_report("assembler", stats_by_file, args.stats_file or "-")
+    if failed:
+        sys.exit(1)
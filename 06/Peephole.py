@@ -0,0 +1,310 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, A_COMMAND, C_COMMAND, L_COMMAND, NO_COMMAND
+
+# Pairs of adjacent C-commands that undo each other.
+CANCELLING_PAIRS = {
+    ("M=M+1", "M=M-1"), ("M=M-1", "M=M+1"),
+    ("D=D+1", "D=D-1"), ("D=D-1", "D=D+1"),
+}
+
+# Upper bound on the rounds of optimize, every round only shrinks the program
+# so this is never reached in practice.
+MAX_ROUNDS = 32
+
+
+class Peephole:
+    """
+    Optimizes parsed assembly before it is emitted, without changing what
+    the program does. Every round threads jumps through labels that only
+    jump elsewhere, drops labels nothing refers to and code no jump can
+    reach, and then removes single instructions that have no effect:
+    A-instructions that load the value A already holds or that are
+    overwritten by the next one, jumps to the very next instruction and
+    increments that are undone right away.
+
+    Code is moved by the optimization, so every jump target has to be a
+    label of the program. A program that jumps to a number or another
+    symbol is left as it is. Targets computed at run time, like the return
+    addresses of the VM translator, are assumed to be label addresses as
+    well.
+    """
+
+    def __init__(self) -> None:
+        """Creates an optimizer with empty counters."""
+        self.words_before = 0
+        self.words_after = 0
+        # rule -> instructions it removed
+        self.removed = {}
+        self.threaded_jumps = 0
+        self.removed_labels = 0
+        self.skipped = False
+
+    def optimize(self, parser: Parser) -> None:
+        """Replaces the commands of parser by optimized ones.
+
+        Args:
+            parser (Parser): a parser of a whole file.
+        """
+        self.words_before += count_words(parser.kinds)
+        if self.has_absolute_jumps(parser):
+            self.skipped = True
+        else:
+            for _ in range(MAX_ROUNDS):
+                changed = False
+                for optimization in (self.thread_jumps, self.remove_dead_code,
+                                     self.remove_useless_instructions):
+                    commands = optimization(parser)
+                    if commands is not None:
+                        parser.replace_commands(commands)
+                        changed = True
+                if not changed:
+                    break
+        self.words_after += count_words(parser.kinds)
+
+    def count_removed(self, rule: str, amount: int = 1) -> None:
+        """
+        Args:
+            rule (str): the name of the rule that removed instructions.
+            amount (int): the number of instructions it removed.
+        """
+        self.removed[rule] = self.removed.get(rule, 0) + amount
+
+    @staticmethod
+    def has_absolute_jumps(parser: Parser) -> bool:
+        """
+        Args:
+            parser (Parser): a parser of a whole file.
+
+        Returns:
+            bool: True if a jump goes to an address that is not a label.
+        """
+        kinds, symbols, jumps = parser.kinds, parser.symbols, parser.jumps
+        labels = {symbol for kind, symbol in zip(kinds, symbols)
+                  if kind == L_COMMAND}
+        for index in range(len(kinds) - 1):
+            if kinds[index] == A_COMMAND and symbols[index] not in labels \
+                    and kinds[index + 1] == C_COMMAND \
+                    and jumps[index + 1] != "null":
+                return True
+        return False
+
+    def thread_jumps(self, parser: Parser) \
+            -> typing.Optional[typing.List[str]]:
+        """Makes jumps to a label whose code is only "@TARGET", "0;JMP" go
+        to TARGET directly. A is only seen to hold a different value when
+        the jump is taken, so the jump must not use A for anything else and
+        a conditional jump must be followed by an A-instruction.
+
+        Args:
+            parser (Parser): a parser of a whole file.
+
+        Returns:
+            typing.Optional[typing.List[str]]: the new commands, or None if
+            nothing changed.
+        """
+        kinds, symbols, dests, comps, jumps = parser.kinds, parser.symbols, \
+            parser.dests, parser.comps, parser.jumps
+        size = len(kinds)
+        # label -> the target its code jumps to
+        trampolines = {}
+        labels = []
+        for index, kind in enumerate(kinds):
+            if kind == L_COMMAND:
+                labels.append(symbols[index])
+                continue
+            if labels and kind == A_COMMAND and index + 1 < size \
+                    and kinds[index + 1] == C_COMMAND \
+                    and jumps[index + 1] == "JMP" \
+                    and dests[index + 1] == "null" and comps[index + 1] == "0":
+                for label in labels:
+                    trampolines[label] = symbols[index]
+            labels = []
+        if not trampolines:
+            return None
+
+        commands = list(parser.input_lines)
+        changed = False
+        for index in range(size - 1):
+            if kinds[index] != A_COMMAND or symbols[index] not in trampolines:
+                continue
+            jump_index = index + 1
+            if kinds[jump_index] != C_COMMAND or jumps[jump_index] == "null" \
+                    or dests[jump_index] != "null" \
+                    or 'A' in comps[jump_index] or 'M' in comps[jump_index]:
+                continue
+            if jumps[jump_index] != "JMP" and \
+                    (jump_index + 1 == size
+                     or kinds[jump_index + 1] != A_COMMAND):
+                continue
+            # follow chains of trampolines, a cycle of them loops forever
+            # wherever it is entered
+            seen = {symbols[index]}
+            target = trampolines[symbols[index]]
+            while target in trampolines and target not in seen:
+                seen.add(target)
+                target = trampolines[target]
+            if target != symbols[index]:
+                commands[index] = '@' + target
+                self.threaded_jumps += 1
+                changed = True
+        return commands if changed else None
+
+    def remove_dead_code(self, parser: Parser) \
+            -> typing.Optional[typing.List[str]]:
+        """Removes labels that no A-instruction refers to, and instructions
+        between an unconditional jump and the next label.
+
+        Args:
+            parser (Parser): a parser of a whole file.
+
+        Returns:
+            typing.Optional[typing.List[str]]: the new commands, or None if
+            nothing changed.
+        """
+        kinds, symbols, jumps = parser.kinds, parser.symbols, parser.jumps
+        referenced = {symbol for kind, symbol in zip(kinds, symbols)
+                      if kind == A_COMMAND}
+        commands = []
+        reachable = True
+        changed = False
+        for index, command in enumerate(parser.input_lines):
+            kind = kinds[index]
+            if kind == L_COMMAND:
+                if symbols[index] not in referenced:
+                    self.removed_labels += 1
+                    changed = True
+                    continue
+                reachable = True
+            elif kind == NO_COMMAND:
+                # it still takes an address, so it is kept where it is
+                reachable = True
+            elif not reachable:
+                self.count_removed("dead_code")
+                changed = True
+                continue
+            elif kind == C_COMMAND and jumps[index] == "JMP":
+                reachable = False
+            commands.append(command)
+        return commands if changed else None
+
+    def remove_useless_instructions(self, parser: Parser) \
+            -> typing.Optional[typing.List[str]]:
+        """Removes A-instructions that load the value A already holds or
+        that are overwritten by the next instruction, jumps to the next
+        instruction and pairs of instructions that undo each other.
+
+        Args:
+            parser (Parser): a parser of a whole file.
+
+        Returns:
+            typing.Optional[typing.List[str]]: the new commands, or None if
+            nothing changed.
+        """
+        kinds, symbols, dests, jumps = parser.kinds, parser.symbols, \
+            parser.dests, parser.jumps
+        input_lines = parser.input_lines
+        size = len(kinds)
+        commands = []
+        command_kinds = []
+        # the symbol A is known to hold, None after labels and writes to A
+        held = None
+        changed = False
+        index = 0
+        while index < size:
+            kind, command = kinds[index], input_lines[index]
+            if kind == A_COMMAND:
+                symbol = symbols[index]
+                if self.jumps_to_next(parser, index):
+                    self.count_removed("jump_to_next", 2)
+                    changed = True
+                    index += 2
+                    continue
+                if symbol == held:
+                    self.count_removed("reload")
+                    changed = True
+                    index += 1
+                    continue
+                if command_kinds and command_kinds[-1] == A_COMMAND:
+                    commands.pop()
+                    command_kinds.pop()
+                    self.count_removed("dead_load")
+                    changed = True
+                held = symbol
+            elif kind == C_COMMAND:
+                if commands and (commands[-1], command) in CANCELLING_PAIRS:
+                    commands.pop()
+                    command_kinds.pop()
+                    self.count_removed("cancelled", 2)
+                    changed = True
+                    index += 1
+                    continue
+                if 'A' in dests[index]:
+                    held = None
+            else:
+                held = None
+            commands.append(command)
+            command_kinds.append(kind)
+            index += 1
+        return commands if changed else None
+
+    @staticmethod
+    def jumps_to_next(parser: Parser, index: int) -> bool:
+        """
+        Args:
+            parser (Parser): a parser of a whole file.
+            index (int): the index of an A-instruction.
+
+        Returns:
+            bool: True if the A-instruction and the jump after it only go to
+            the label right after them, which is followed by an A-instruction
+            that makes the value left in A irrelevant.
+        """
+        kinds, symbols, dests, jumps = parser.kinds, parser.symbols, \
+            parser.dests, parser.jumps
+        size = len(kinds)
+        jump_index = index + 1
+        if jump_index >= size or kinds[jump_index] != C_COMMAND \
+                or jumps[jump_index] == "null" \
+                or dests[jump_index] != "null":
+            return False
+        following = jump_index + 1
+        labels = set()
+        while following < size and kinds[following] == L_COMMAND:
+            labels.add(symbols[following])
+            following += 1
+        return symbols[index] in labels and following < size \
+            and kinds[following] == A_COMMAND
+
+    def summary(self, name: str) -> str:
+        """
+        Args:
+            name (str): the name of the optimized file.
+
+        Returns:
+            str: a line reporting the ROM words saved.
+        """
+        if self.skipped:
+            return "{}: not optimized, it jumps to addresses that are not " \
+                   "labels".format(name)
+        saved = self.words_before - self.words_after
+        return "{}: {} -> {} words, {} saved ({:.1%})".format(
+            name, self.words_before, self.words_after, saved,
+            saved / self.words_before if self.words_before else 0)
+
+
+def count_words(kinds: typing.List[int]) -> int:
+    """
+    Args:
+        kinds (typing.List[int]): the Parser.kinds of a file.
+
+    Returns:
+        int: the number of instructions, i.e. the ROM words of the file.
+    """
+    return kinds.count(A_COMMAND) + kinds.count(C_COMMAND)
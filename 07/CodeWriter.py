@@ -7,15 +7,141 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+# Shared routines of the comparisons, written once per program when the
+# CodeWriter is given a comparisons set. A call site stores its return
+# address in R15 and jumps to the routine, which pops y, replaces x by the
+# result of "x op y" and jumps back. eq only needs x - y, which is 0 exactly
+# when x == y even if it overflows, while gt and lt compare the signs first
+# so that the subtraction never overflows.
+COMPARISON_ROUTINES = {
+    "eq":
+        "(VM$COMPARE_EQ)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"
+        "@VM$COMPARE_TRUE\n"
+        "D;JEQ\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+
+    "gt":
+        "(VM$COMPARE_GT)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_GT_YNEG\n"
+        "D;JLT\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_FALSE\n"  # x<0<=y
+        "D;JLT\n"
+        "@VM$COMPARE_GT_SAMESIGN\n"
+        "0;JMP\n"
+        "(VM$COMPARE_GT_YNEG)\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_TRUE\n"  # y<0<=x
+        "D;JGE\n"
+        "(VM$COMPARE_GT_SAMESIGN)\n"
+        "@SP\n"
+        "A=M\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"  # x - y
+        "@VM$COMPARE_TRUE\n"
+        "D;JGT\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+
+    "lt":
+        "(VM$COMPARE_LT)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_LT_YNEG\n"
+        "D;JLT\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_TRUE\n"  # x<0<=y
+        "D;JLT\n"
+        "@VM$COMPARE_LT_SAMESIGN\n"
+        "0;JMP\n"
+        "(VM$COMPARE_LT_YNEG)\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_FALSE\n"  # y<0<=x
+        "D;JGE\n"
+        "(VM$COMPARE_LT_SAMESIGN)\n"
+        "@SP\n"
+        "A=M\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"  # x - y
+        "@VM$COMPARE_TRUE\n"
+        "D;JLT\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+}
+
+# Where every comparison routine ends, it stores the result and returns.
+COMPARISON_RESULTS = (
+    "(VM$COMPARE_TRUE)\n"
+    "@SP\n"
+    "A=M-1\n"
+    "M=-1\n"
+    "@R15\n"
+    "A=M\n"
+    "0;JMP\n"
+    "(VM$COMPARE_FALSE)\n"
+    "@SP\n"
+    "A=M-1\n"
+    "M=0\n"
+    "@R15\n"
+    "A=M\n"
+    "0;JMP\n")
+
+
+def write_comparison_routines(output_stream: typing.TextIO,
+                              comparisons: typing.Set[str]) -> None:
+    """Writes the shared routines of the given comparisons. Must be called
+    once, after the whole program. A program that runs past its end is
+    stopped by an endless loop in front of the routines.
+
+    Args:
+        output_stream (typing.TextIO): output stream.
+        comparisons (typing.Set[str]): the comparisons called by the program.
+    """
+    if not comparisons:
+        return
+    output_stream.write("// comparison routines\n"
+                        "(VM$COMPARE_END)\n"
+                        "@VM$COMPARE_END\n"
+                        "0;JMP\n")
+    for command in sorted(comparisons):
+        output_stream.write(COMPARISON_ROUTINES[command])
+    output_stream.write(COMPARISON_RESULTS)
+
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 comparisons: typing.Optional[typing.Set[str]] = None) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            comparisons (typing.Optional[typing.Set[str]]): if given, eq, gt
+                and lt call shared routines instead of being inlined, and
+                every comparison called is added to this set. The set may be
+                shared by the CodeWriters of all the files of a program, and
+                write_comparison_routines must be called with it at the end.
         """
         # Your code goes here!
         # Note that you can write to output_stream like so:
@@ -25,6 +151,7 @@ class CodeWriter:
         self.counter_for_call = 0
         self.input_filename = ''
         self.current_function = ''
+        self.comparisons = comparisons
         self.outp_stream.write("@256\nD=A\n@SP\nM=D\n")
         self.segment_base_addresses = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
 
@@ -142,7 +269,9 @@ class CodeWriter:
 
         if command in ["gt", "lt", "eq"]:
             self.counter_for_labels += 1
-            if command == "gt":
+            if self.comparisons is not None:
+                self.write_comparison_call(command)
+            elif command == "gt":
                 self.outp_stream.write("//gt\n"
                     "@SP\n"
                 "M=M-1\n"
@@ -311,6 +440,24 @@ class CodeWriter:
         else:
             self.outp_stream.write(self.arithmetic_dict[command])
 
+    def write_comparison_call(self, command: str) -> None:
+        """Writes a call to the shared routine of a comparison.
+
+        Args:
+            command (str): "eq", "gt" or "lt".
+        """
+        return_label = self.input_filename + "$COMPARE_RETURN" + \
+            str(self.counter_for_labels)
+        self.comparisons.add(command)
+        self.outp_stream.write("//" + command + "\n"
+                               "@" + return_label + "\n"
+                               "D=A\n"
+                               "@R15\n"
+                               "M=D\n"
+                               "@VM$COMPARE_" + command.upper() + "\n"
+                               "0;JMP\n"
+                               "(" + return_label + ")\n")
+
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
         """Writes assembly code that is the translation of the given
         command, where command is either C_PUSH or C_POP.
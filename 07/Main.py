@@ -5,11 +5,12 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
 import os
-import sys
 import typing
 from Parser import Parser
-from CodeWriter import CodeWriter
+from CodeWriter import CodeWriter, write_comparison_routines
+from Folding import ConstantFolder
 
 
 import typing
@@ -32,16 +33,26 @@ def translate_vm_instruction(parser, code_writer):
     if command_type in action_map:
         action_map[command_type]()
 
-def translate_file(input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+def translate_file(
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        folder: typing.Optional[ConstantFolder] = None) -> None:
     """Translates a single VM file to Hack assembly.
 
     Args:
         input_file (typing.TextIO): VM file to translate.
         output_file (typing.TextIO): Destination for Hack assembly code.
-        bootstrap (bool): If True, includes bootstrap code for VM initialization.
+        comparisons (typing.Optional[typing.Set[str]]): If given, eq, gt and
+            lt call shared routines, and the comparisons called are added to
+            this set. The routines are written by write_comparison_routines
+            once the whole program is translated.
+        folder (typing.Optional[ConstantFolder]): If given, folds constant
+            arithmetic and drops identity operations before translating.
     """
     parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
+    if folder is not None:
+        parser.replace_commands(folder.fold(parser.input_lines))
+    code_writer = CodeWriter(output_file, comparisons)
 
     # code_writer.write_init()
 
@@ -60,9 +71,18 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="VMtranslator")
+    arg_parser.add_argument("input_path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--shared-comparisons", action="store_true",
+        help="translate eq, gt and lt to calls of routines written once "
+             "per program instead of inlining them")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="evaluate arithmetic on constants and drop operations that do "
+             "not change the stack before translating")
+    args = arg_parser.parse_args()
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -73,10 +93,16 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
+    comparisons = set() if args.shared_comparisons else None
+    folder = ConstantFolder() if args.fold else None
     with open(output_path, 'w') as output_file:
         for input_path in files_to_translate:
             filename, extension = os.path.splitext(input_path)
             if extension.lower() != ".vm":
                 continue
             with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file)
+                translate_file(input_file, output_file, comparisons, folder)
+        if comparisons:
+            write_comparison_routines(output_file, comparisons)
+    if folder is not None:
+        print(folder.report())
@@ -74,6 +74,15 @@ class Parser:
         self.input_lines = removing_comments(self.input_lines)
         self.input_lines = removing_whitespaces(self.input_lines)
 
+    def replace_commands(self, commands: typing.List[str]) -> None:
+        """Parses commands instead of the current ones, as an optimization
+        pass that rewrites the program does.
+
+        Args:
+            commands (typing.List[str]): commands without comments.
+        """
+        self.input_lines = commands
+
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
 
@@ -0,0 +1,129 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, C_FUNCTION, C_CALL
+from Inlining import Inliner
+
+# The function the bootstrap calls, see CodeWriter.write_initlizaiton.
+ENTRY_POINT = "Sys.init"
+
+
+class CallGraph:
+    """
+    The functions of a whole program and the functions each one calls.
+    Every file is added before any is translated, then the functions that
+    cannot be reached from ENTRY_POINT are removed from each file before
+    code is generated for it. Commands in front of the first function of a
+    file belong to no function, so they are always kept and the functions
+    they call are reachable.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty call graph."""
+        # function -> the functions it calls, None for commands outside of
+        # any function
+        self.calls = {None: set()}
+        # the reachable functions, or None if every function is kept
+        self.live = None
+        self.functions_removed = 0
+        self.commands_removed = 0
+        self.bytes_saved = 0
+
+    def add_file(self, parser: Parser,
+                 inliner: typing.Optional[Inliner] = None) -> None:
+        """Adds the functions of a parsed file and the calls they make.
+
+        Args:
+            parser (Parser): the parser of the file.
+            inliner (typing.Optional[Inliner]): if given, calls it inlines
+                are not calls, so a function that is only inlined is dead.
+        """
+        calls = self.calls
+        function = None
+        for opcode, arg1, arg2 in zip(parser.opcodes, parser.args1,
+                                      parser.args2):
+            if opcode == C_FUNCTION:
+                function = arg1
+                calls.setdefault(function, set())
+            elif opcode == C_CALL and (inliner is None
+                                       or not inliner.can_inline(arg1, arg2)):
+                calls[function].add(arg1)
+
+    def find_live(self) -> None:
+        """Finds the functions reachable from ENTRY_POINT. A program without
+        ENTRY_POINT has no known start, so all its functions are kept.
+        """
+        if ENTRY_POINT not in self.calls:
+            return
+        live = set()
+        pending = [None, ENTRY_POINT]
+        while pending:
+            function = pending.pop()
+            if function in live:
+                continue
+            live.add(function)
+            pending.extend(self.calls.get(function, ()))
+        self.live = live
+
+    def remove_dead_functions(self, parser: Parser) -> typing.List[str]:
+        """Removes the functions find_live did not reach from a parsed file.
+
+        Args:
+            parser (Parser): the parser of the file.
+
+        Returns:
+            typing.List[str]: the commands of the removed functions.
+        """
+        if self.live is None:
+            return []
+        live = self.live
+        kept = []
+        removed = []
+        kept_indices = []
+        alive = True
+        for index, (opcode, arg1, command) in enumerate(
+                zip(parser.opcodes, parser.args1, parser.input_lines)):
+            if opcode == C_FUNCTION:
+                alive = arg1 in live
+                if not alive:
+                    self.functions_removed += 1
+            if alive:
+                kept.append(command)
+                kept_indices.append(index)
+            else:
+                removed.append(command)
+        if removed:
+            self.commands_removed += len(removed)
+            line_numbers = parser.line_numbers
+            parser.replace_commands(
+                kept, None if line_numbers is None
+                else [line_numbers[index] for index in kept_indices])
+        return removed
+
+    def merge(self, other: "CallGraph") -> None:
+        """Adds the counters of other to these.
+
+        Args:
+            other (CallGraph): a copy of this graph that translated other
+                files.
+        """
+        self.functions_removed += other.functions_removed
+        self.commands_removed += other.commands_removed
+        self.bytes_saved += other.bytes_saved
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the functions, commands and bytes of assembly removed.
+        """
+        if self.live is None:
+            return "dead functions: kept, there is no " + ENTRY_POINT
+        return "dead functions removed: {}\ncommands removed: {}\n" \
+               "bytes saved: {}".format(self.functions_removed,
+                                        self.commands_removed,
+                                        self.bytes_saved)
@@ -6,16 +6,279 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from Templates import TemplateEngine
+from Prologue import PrologueWriter, ZERO_ROUTINE
+
+# Shared routines of the comparisons, written once per program when the
+# CodeWriter is given a comparisons set. A call site stores its return
+# address in R15 and jumps to the routine, which pops y, replaces x by the
+# result of "x op y" and jumps back. eq only needs x - y, which is 0 exactly
+# when x == y even if it overflows, while gt and lt compare the signs first
+# so that the subtraction never overflows.
+COMPARISON_ROUTINES = {
+    "eq":
+        "(VM$COMPARE_EQ)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"
+        "@VM$COMPARE_TRUE\n"
+        "D;JEQ\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+
+    "gt":
+        "(VM$COMPARE_GT)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_GT_YNEG\n"
+        "D;JLT\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_FALSE\n"  # x<0<=y
+        "D;JLT\n"
+        "@VM$COMPARE_GT_SAMESIGN\n"
+        "0;JMP\n"
+        "(VM$COMPARE_GT_YNEG)\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_TRUE\n"  # y<0<=x
+        "D;JGE\n"
+        "(VM$COMPARE_GT_SAMESIGN)\n"
+        "@SP\n"
+        "A=M\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"  # x - y
+        "@VM$COMPARE_TRUE\n"
+        "D;JGT\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+
+    "lt":
+        "(VM$COMPARE_LT)\n"
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_LT_YNEG\n"
+        "D;JLT\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_TRUE\n"  # x<0<=y
+        "D;JLT\n"
+        "@VM$COMPARE_LT_SAMESIGN\n"
+        "0;JMP\n"
+        "(VM$COMPARE_LT_YNEG)\n"
+        "@SP\n"
+        "A=M-1\n"
+        "D=M\n"
+        "@VM$COMPARE_FALSE\n"  # y<0<=x
+        "D;JGE\n"
+        "(VM$COMPARE_LT_SAMESIGN)\n"
+        "@SP\n"
+        "A=M\n"
+        "D=M\n"
+        "A=A-1\n"
+        "D=M-D\n"  # x - y
+        "@VM$COMPARE_TRUE\n"
+        "D;JLT\n"
+        "@VM$COMPARE_FALSE\n"
+        "0;JMP\n",
+}
+
+# Where every comparison routine ends, it stores the result and returns.
+COMPARISON_RESULTS = (
+    "(VM$COMPARE_TRUE)\n"
+    "@SP\n"
+    "A=M-1\n"
+    "M=-1\n"
+    "@R15\n"
+    "A=M\n"
+    "0;JMP\n"
+    "(VM$COMPARE_FALSE)\n"
+    "@SP\n"
+    "A=M-1\n"
+    "M=0\n"
+    "@R15\n"
+    "A=M\n"
+    "0;JMP\n")
+
+# Shared routines of call and return, written once per program when the
+# CodeWriter is given a calls set. A call site stores nArgs in R13 and the
+# address of the callee in R14, and jumps to VM$CALL with the return address
+# in D. VM$CALL saves the frame of the caller, repositions ARG and LCL and
+# jumps to the callee. A return only jumps to VM$RETURN.
+CALL_ROUTINES = {
+    "call":
+        "(VM$CALL)\n"
+        "@SP\n"
+        "A=M\n"
+        "M=D\n"  # push the return address
+        "@LCL\n"
+        "D=M\n"
+        "@SP\n"
+        "AM=M+1\n"
+        "M=D\n"
+        "@ARG\n"
+        "D=M\n"
+        "@SP\n"
+        "AM=M+1\n"
+        "M=D\n"
+        "@THIS\n"
+        "D=M\n"
+        "@SP\n"
+        "AM=M+1\n"
+        "M=D\n"
+        "@THAT\n"
+        "D=M\n"
+        "@SP\n"
+        "AM=M+1\n"
+        "M=D\n"
+        "@SP\n"
+        "MD=M+1\n"
+        "@LCL\n"
+        "M=D\n"  # LCL = SP
+        "@R13\n"
+        "D=D-M\n"
+        "@5\n"
+        "D=D-A\n"
+        "@ARG\n"
+        "M=D\n"  # ARG = SP - nArgs - 5
+        "@R14\n"
+        "A=M\n"
+        "0;JMP\n",
+
+    "return":
+        "(VM$RETURN)\n"
+        "@LCL\n"
+        "D=M\n"
+        "@R13\n"
+        "M=D\n"  # R13 = endFrame
+        "@5\n"
+        "A=D-A\n"
+        "D=M\n"
+        "@R14\n"
+        "M=D\n"  # R14 = return address
+        "@SP\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@ARG\n"
+        "A=M\n"
+        "M=D\n"  # *ARG = pop()
+        "@ARG\n"
+        "D=M+1\n"
+        "@SP\n"
+        "M=D\n"
+        "@R13\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@THAT\n"
+        "M=D\n"
+        "@R13\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@THIS\n"
+        "M=D\n"
+        "@R13\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@ARG\n"
+        "M=D\n"
+        "@R13\n"
+        "AM=M-1\n"
+        "D=M\n"
+        "@LCL\n"
+        "M=D\n"
+        "@R14\n"
+        "A=M\n"
+        "0;JMP\n",
+}
+
+
+# Binary commands that fused code applies with a single instruction, and the
+# operator of that instruction.
+FUSED_OPERATORS = {"add": "+", "sub": "-", "and": "&", "or": "|"}
+
+# With the top of the stack cached in D, the instruction that applies a
+# binary command to the value below it in RAM[SP] and D, or a unary command
+# to D.
+CACHED_BINARY = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M",
+                 "or": "D=D|M"}
+CACHED_UNARY = {"neg": "D=-D", "not": "D=!D", "shiftleft": "D=D<<",
+                "shiftright": "D=D>>"}
+
+
+def write_shared_routines(
+        output_stream: typing.TextIO,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        calls: typing.Optional[typing.Set[str]] = None,
+        prologues: typing.Optional[PrologueWriter] = None) -> None:
+    """Writes the shared routines called by a program. Must be called once,
+    after the whole program. A program that runs past its end is stopped by
+    an endless loop in front of the routines.
+
+    Args:
+        output_stream (typing.TextIO): output stream.
+        comparisons (typing.Optional[typing.Set[str]]): the comparisons
+            called by the program.
+        calls (typing.Optional[typing.Set[str]]): "call" and "return" if the
+            program called their routines.
+        prologues (typing.Optional[PrologueWriter]): the writer of the
+            prologues of the program, which may call the zeroing routine.
+    """
+    zero_routine = prologues is not None and prologues.routine_used
+    if not comparisons and not calls and not zero_routine:
+        return
+    output_stream.write("// shared routines\n"
+                        "(VM$HALT)\n"
+                        "@VM$HALT\n"
+                        "0;JMP\n")
+    if comparisons:
+        for command in sorted(comparisons):
+            output_stream.write(COMPARISON_ROUTINES[command])
+        output_stream.write(COMPARISON_RESULTS)
+    if calls:
+        for command in sorted(calls):
+            output_stream.write(CALL_ROUTINES[command])
+    if zero_routine:
+        output_stream.write(ZERO_ROUTINE)
 
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 comparisons: typing.Optional[typing.Set[str]] = None,
+                 calls: typing.Optional[typing.Set[str]] = None,
+                 cache_top: bool = False,
+                 templates: typing.Optional[TemplateEngine] = None,
+                 prologues: typing.Optional[PrologueWriter] = None) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            comparisons (typing.Optional[typing.Set[str]]): if given, eq, gt
+                and lt call shared routines instead of being inlined, and
+                every comparison called is added to this set. The set may be
+                shared by the CodeWriters of all the files of a program, and
+                write_shared_routines must be called with it at the end.
+            calls (typing.Optional[typing.Set[str]]): like comparisons, for
+                the shared routines of call and return.
+            cache_top (bool): if True, the top of the stack is kept in D
+                between commands whenever possible, and only written to the
+                stack (spilled) before commands that need it there, like
+                labels, jumps, calls and returns.
+            templates (typing.Optional[TemplateEngine]): if given, chooses
+                the code of pushes and pops that do not keep the top of the
+                stack in D.
+            prologues (typing.Optional[PrologueWriter]): if given, writes
+                the code that zeroes the locals of every function, otherwise
+                each local is pushed.
         """
         # Your code goes here!
         # Note that you can write to output_stream like so:
@@ -25,6 +288,14 @@ class CodeWriter:
         self.counter_for_call = 0
         self.input_filename = ''
         self.current_function = ''
+        self.comparisons = comparisons
+        self.calls = calls
+        self.cache_top = cache_top
+        self.templates = templates
+        self.prologues = prologues
+        # True when the top of the stack is in D and not on the stack, SP
+        # then points where it belongs
+        self.top_in_d = False
         self.outp_stream.write("@256\nD=A\n@SP\nM=D\n")
         self.segment_base_addresses = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
 
@@ -139,10 +410,16 @@ class CodeWriter:
             command (str): an arithmetic command.
         """
         # Your code goes here!
+        if self.cache_top:
+            if self.write_cached_arithmetic(command):
+                return
+            self.spill_top()
 
         if command in ["gt", "lt", "eq"]:
             self.counter_for_labels += 1
-            if command == "gt":
+            if self.comparisons is not None:
+                self.write_comparison_call(command)
+            elif command == "gt":
                 self.outp_stream.write("//gt\n"
                     "@SP\n"
                 "M=M-1\n"
@@ -173,7 +450,7 @@ class CodeWriter:
                                                         "@"+self.input_filename+
                 "$SAMESIGNORSECZERO" + str(self.counter_for_labels) + "\n"
                 "D;JLE\n"
-                                                                      
+                                                                      "@"+self.input_filename+
                 "$TRUE" + str(self.counter_for_labels) + "\n"  # top<sec so true
                 "0;JMP\n"
                 "("
@@ -370,6 +647,91 @@ class CodeWriter:
         else:
             self.outp_stream.write(self.arithmetic_dict[command])
 
+    def spill_top(self) -> None:
+        """Writes the top of the stack from D to the stack, if it is cached
+        there."""
+        if self.top_in_d:
+            self.outp_stream.write("//spill\n@SP\nM=M+1\nA=M-1\nM=D\n")
+            self.top_in_d = False
+
+    def write_cached_arithmetic(self, command: str) -> bool:
+        """Writes an arithmetic command that leaves its result in D, when
+        caching the top of the stack pays off for it.
+
+        Args:
+            command (str): an arithmetic command.
+
+        Returns:
+            bool: False if the command was not written.
+        """
+        if command in CACHED_BINARY:
+            code = "//" + command + "\n"
+            if not self.top_in_d:
+                code += "@SP\nAM=M-1\nD=M\n"
+            code += "@SP\nAM=M-1\n" + CACHED_BINARY[command] + "\n"
+        elif command in CACHED_UNARY and self.top_in_d:
+            code = "//" + command + "\n" + CACHED_UNARY[command] + "\n"
+        else:
+            return False
+        self.outp_stream.write(code)
+        self.top_in_d = True
+        return True
+
+    def write_cached_push_pop(self, command: str, segment: str,
+                              index: int) -> None:
+        """Writes a push that leaves the value in D, or a pop that takes it
+        from there.
+
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+        """
+        if command == "C_PUSH":
+            self.spill_top()
+            self.outp_stream.write("//push " + segment + " " + str(index) +
+                                   "\n" + self.load_code(segment, index))
+            self.top_in_d = True
+            return
+        code = "//pop " + segment + " " + str(index) + "\n"
+        if not self.top_in_d:
+            code += "@SP\nAM=M-1\nD=M\n"
+        address, changes_d = self.address_code(segment, index)
+        if not changes_d:
+            code += address + "M=D\n"
+        else:
+            code += "@R13\n" \
+                    "M=D\n" + \
+                    address + \
+                    "D=A\n" \
+                    "@R14\n" \
+                    "M=D\n" \
+                    "@R13\n" \
+                    "D=M\n" \
+                    "@R14\n" \
+                    "A=M\n" \
+                    "M=D\n"
+        self.outp_stream.write(code)
+        self.top_in_d = False
+
+    def write_comparison_call(self, command: str) -> None:
+        """Writes a call to the shared routine of a comparison.
+
+        Args:
+            command (str): "eq", "gt" or "lt".
+        """
+        return_label = self.input_filename + "$COMPARE_RETURN" + \
+            str(self.counter_for_labels)
+        self.comparisons.add(command)
+        self.outp_stream.write("//" + command + "\n"
+                               "@" + return_label + "\n"
+                               "D=A\n"
+                               "@R15\n"
+                               "M=D\n"
+                               "@VM$COMPARE_" + command.upper() + "\n"
+                               "0;JMP\n"
+                               "(" + return_label + ")\n")
+
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
         """Writes assembly code that is the translation of the given
         command, where command is either C_PUSH or C_POP.
@@ -379,7 +741,13 @@ class CodeWriter:
             segment (str): the memory segment to operate on.
             index (int): the index in the memory segment.
         """
-
+        if self.cache_top:
+            self.write_cached_push_pop(command, segment, index)
+            return
+        if self.templates is not None:
+            self.outp_stream.write(self.templates.push_pop(
+                command, segment, index, self.input_filename))
+            return
 
         if command == "C_PUSH":
             if segment == "constant":
@@ -468,6 +836,133 @@ class CodeWriter:
                                        "A=M\n" +
                                        "M=D\n")
 
+    def address_code(self, segment: str,
+                     index: int) -> typing.Tuple[str, bool]:
+        """
+        Args:
+            segment (str): a memory segment other than constant.
+            index (int): the index in the memory segment.
+
+        Returns:
+            typing.Tuple[str, bool]: code that points A at segment[index],
+            and whether that code changes D.
+        """
+        if segment == "static":
+            return "@" + self.input_filename + "." + str(index) + "\n", False
+        if segment in ["temp", "pointer"]:
+            offset = 5 if segment == "temp" else 3
+            return "@" + str(offset + index) + "\n", False
+        base = "@" + self.segment_base_addresses[segment] + "\n"
+        if index == 0:
+            return base + "A=M\n", False
+        if index == 1:
+            return base + "A=M+1\n", False
+        if index == 2:
+            return base + "A=M+1\nA=A+1\n", False
+        return base + "D=M\n@" + str(index) + "\nA=D+A\n", True
+
+    def load_code(self, segment: str, index: int) -> str:
+        """
+        Args:
+            segment (str): a memory segment.
+            index (int): the index in the memory segment.
+
+        Returns:
+            str: code that puts the value of segment[index] in D.
+        """
+        if segment == "constant":
+            return "@" + str(index) + "\nD=A\n"
+        return self.address_code(segment, index)[0] + "D=M\n"
+
+    def write_constant_arithmetic(self, command: str, constant: int) -> None:
+        """Writes "push constant constant", command without pushing the
+        constant.
+
+        Args:
+            command (str): one of the keys of FUSED_OPERATORS.
+            constant (int): the constant.
+        """
+        operator = FUSED_OPERATORS[command]
+        code = "//push constant " + str(constant) + ", " + command + "\n"
+        if self.top_in_d:
+            if constant == 1 and command in ["add", "sub"]:
+                code += "D=D" + operator + "1\n"
+            else:
+                code += "@" + str(constant) + "\nD=D" + operator + "A\n"
+        elif constant == 1 and command in ["add", "sub"]:
+            code += "@SP\nA=M-1\nM=M" + operator + "1\n"
+        else:
+            code += "@" + str(constant) + "\nD=A\n@SP\nA=M-1\n" \
+                    "M=M" + operator + "D\n"
+        self.outp_stream.write(code)
+
+    def write_update_in_place(self, segment: str, index: int, command: str,
+                              constant: int) -> None:
+        """Writes "push segment index", "push constant constant", command,
+        "pop segment index" as a single update of segment[index] that does
+        not touch the stack.
+
+        Args:
+            segment (str): a memory segment other than constant.
+            index (int): the index in the memory segment.
+            command (str): "add" or "sub".
+            constant (int): the constant.
+        """
+        self.spill_top()
+        operator = FUSED_OPERATORS[command]
+        address, changes_d = self.address_code(segment, index)
+        code = "//" + segment + " " + str(index) + " " + operator + "= " + \
+            str(constant) + "\n"
+        if constant == 1:
+            code += address + "M=M" + operator + "1\n"
+        elif not changes_d:
+            code += "@" + str(constant) + "\nD=A\n" + address + \
+                    "M=M" + operator + "D\n"
+        else:
+            code += "@" + self.segment_base_addresses[segment] + "\n" \
+                    "D=M\n" \
+                    "@" + str(index) + "\n" \
+                    "D=D+A\n" \
+                    "@R13\n" \
+                    "M=D\n" \
+                    "@" + str(constant) + "\n" \
+                    "D=A\n" \
+                    "@R13\n" \
+                    "A=M\n" \
+                    "M=M" + operator + "D\n"
+        self.outp_stream.write(code)
+
+    def write_move(self, source_segment: str, source_index: int,
+                   segment: str, index: int) -> None:
+        """Writes "push source_segment source_index", "pop segment index" as
+        a copy that does not touch the stack.
+
+        Args:
+            source_segment (str): the memory segment to copy from.
+            source_index (int): the index in source_segment.
+            segment (str): the memory segment to copy to, not constant.
+            index (int): the index in segment.
+        """
+        self.spill_top()
+        load = self.load_code(source_segment, source_index)
+        address, changes_d = self.address_code(segment, index)
+        code = "//" + segment + " " + str(index) + " = " + source_segment + \
+            " " + str(source_index) + "\n"
+        if not changes_d:
+            code += load + address + "M=D\n"
+        else:
+            code += "@" + self.segment_base_addresses[segment] + "\n" \
+                    "D=M\n" \
+                    "@" + str(index) + "\n" \
+                    "D=D+A\n" \
+                    "@R13\n" \
+                    "M=D\n" + \
+                    load + \
+                    "@R13\n" \
+                    "A=M\n" \
+                    "M=D\n"
+        self.outp_stream.write(code)
+
     # Assume output_stream and func are defined in the broader scope as before
 
     def write_assembly(self, instruction):
@@ -476,22 +971,35 @@ class CodeWriter:
 
     def write_label(self, label):
         """Writes assembly code for the label command."""
+        self.spill_top()
         label_name = self.current_function + "$" + label
         self.write_assembly(f"// label {label}\n({label_name})")
 
     def write_goto(self, label):
         """Writes assembly code for the goto command."""
+        self.spill_top()
         label_name = self.current_function + "$" + label
         self.write_assembly(f"// goto \n@{label_name}\n0;JMP")
 
     def write_if(self, label):
         """Writes assembly code for the if-goto command."""
         label_name = self.current_function + "$" + label
+        if self.top_in_d:
+            self.top_in_d = False
+            self.write_assembly(f"// if-goto\n@{label_name}\nD;JNE")
+            return
         self.write_assembly(f"// if-goto\n@SP\nA=M-1\nD=M\n@SP\nM=M-1\n@{label_name}\nD;JNE")
 
     def write_function(self, function_name, n_vars):
         """Writes assembly code for the function command."""
+        self.spill_top()
         self.current_function = function_name  # Update the function context
+        if self.prologues is not None:
+            self.write_assembly(f"// function {function_name}\n"
+                                f"({function_name})")
+            self.outp_stream.write(
+                self.prologues.prologue(function_name, n_vars))
+            return
         instructions = [f"// function {function_name}\n({function_name})"]
         instructions += ["@SP\nA=M\nM=0\n@SP\nM=M+1" for _ in range(n_vars)]
         self.write_assembly('\n'.join(instructions))
@@ -529,7 +1037,11 @@ class CodeWriter:
         # goto function_name    // transfers control to the callee
         # (return_address)      // injects the return address label into the code
 
+        self.spill_top()
         return_address = f"{self.current_function}$ret.{self.counter_for_call}"
+        if self.calls is not None:
+            self.write_shared_call(function_name, n_args, return_address)
+            return
         assembly_code = f"//call function\n"
         # Push return address
         assembly_code += f"@{return_address}\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
@@ -558,6 +1070,32 @@ class CodeWriter:
         self.counter_for_call += 1
 
 
+    def write_shared_call(self, function_name: str, n_args: int,
+                          return_address: str) -> None:
+        """Writes a call through the shared VM$CALL routine.
+
+        Args:
+            function_name (str): the name of the function to call.
+            n_args (int): the number of arguments of the function.
+            return_address (str): the label of the return address.
+        """
+        self.calls.add("call")
+        self.outp_stream.write(f"//call {function_name} {n_args}\n"
+                               f"@{n_args}\n"
+                               "D=A\n"
+                               "@R13\n"
+                               "M=D\n"
+                               f"@{function_name}\n"
+                               "D=A\n"
+                               "@R14\n"
+                               "M=D\n"
+                               f"@{return_address}\n"
+                               "D=A\n"
+                               "@VM$CALL\n"
+                               "0;JMP\n"
+                               f"({return_address})\n")
+        self.counter_for_call += 1
+
     def obscure_return_logic(self) -> None:
         """This method facilitates the complex return logic."""
         # Define some obscure variable names
@@ -635,4 +1173,9 @@ class CodeWriter:
 
 
     def write_return(self) -> None:
+        self.spill_top()
+        if self.calls is not None:
+            self.calls.add("return")
+            self.outp_stream.write("//return\n@VM$RETURN\n0;JMP\n")
+            return
         self.obscure_return_logic()
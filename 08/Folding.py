@@ -0,0 +1,150 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# The largest value "push constant" accepts.
+MAX_CONSTANT = 32767
+
+
+def to_signed(value: int) -> int:
+    """
+    Args:
+        value (int): a 16-bit word.
+
+    Returns:
+        int: the word as a two's complement number.
+    """
+    return value - 0x10000 if value & 0x8000 else value
+
+
+# Folding of the binary commands on two 16-bit words, x below y.
+BINARY_FOLDS = {
+    "add": lambda x, y: (x + y) & 0xFFFF,
+    "sub": lambda x, y: (x - y) & 0xFFFF,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: 0xFFFF if x == y else 0,
+    "gt": lambda x, y: 0xFFFF if to_signed(x) > to_signed(y) else 0,
+    "lt": lambda x, y: 0xFFFF if to_signed(x) < to_signed(y) else 0,
+}
+
+# Folding of the unary commands on a 16-bit word. shiftright is arithmetic,
+# like the ShiftRight chip.
+UNARY_FOLDS = {
+    "neg": lambda x: -x & 0xFFFF,
+    "not": lambda x: ~x & 0xFFFF,
+    "shiftleft": lambda x: (x << 1) & 0xFFFF,
+    "shiftright": lambda x: (to_signed(x) >> 1) & 0xFFFF,
+}
+
+# Binary commands that leave x as it is when y is this constant.
+IDENTITIES = {"add": 0, "sub": 0, "or": 0, "and": 0xFFFF}
+
+# Unary commands that undo themselves.
+INVOLUTIONS = ("neg", "not")
+
+
+class ConstantFolder:
+    """
+    Rewrites a stream of VM commands, evaluating arithmetic on constants at
+    translation time with the 16-bit wraparound of the Hack ALU, and
+    dropping commands that do not change the stack, like "push constant 0",
+    "add" or "neg", "neg". Only adjacent commands are combined, so labels
+    keep the commands before and after them apart.
+    """
+
+    def __init__(self) -> None:
+        """Creates a folder with empty counters."""
+        self.folded = 0
+        self.identities = 0
+        self.commands_before = 0
+        self.commands_after = 0
+
+    def fold(self, commands: typing.List[str]) -> typing.List[str]:
+        """
+        Args:
+            commands (typing.List[str]): VM commands without comments.
+
+        Returns:
+            typing.List[str]: the simplified commands. Constants that do not
+            fit in "push constant" are pushed as "push constant ~c", "not".
+        """
+        # known constants are kept as ints until the end, commands as text
+        items = []
+        for command in commands:
+            fields = command.split()
+            if len(fields) == 3 and fields[0] == "push" \
+                    and fields[1] == "constant" and fields[2].isdigit() \
+                    and int(fields[2]) <= MAX_CONSTANT:
+                items.append(int(fields[2]))
+            else:
+                items.append(' '.join(fields))
+                self.simplify(items)
+
+        folded = []
+        for item in items:
+            if isinstance(item, str):
+                folded.append(item)
+            elif item <= MAX_CONSTANT:
+                folded.append("push constant " + str(item))
+            else:
+                folded.append("push constant " + str(~item & 0xFFFF))
+                folded.append("not")
+        self.commands_before += len(commands)
+        self.commands_after += len(folded)
+        return folded
+
+    def simplify(self, items: typing.List[typing.Union[int, str]]) -> None:
+        """Applies the rules to the end of items until none matches.
+
+        Args:
+            items (typing.List[typing.Union[int, str]]): the commands so far,
+                with known constants as ints.
+        """
+        while len(items) >= 2:
+            command, operand = items[-1], items[-2]
+            if command in BINARY_FOLDS and len(items) >= 3 \
+                    and isinstance(operand, int) \
+                    and isinstance(items[-3], int):
+                del items[-2:]
+                items[-1] = BINARY_FOLDS[command](items[-1], operand)
+                self.folded += 1
+            elif command in UNARY_FOLDS and isinstance(operand, int):
+                del items[-1]
+                items[-1] = UNARY_FOLDS[command](operand)
+                self.folded += 1
+            elif command in IDENTITIES and isinstance(operand, int) \
+                    and operand == IDENTITIES[command]:
+                del items[-2:]
+                self.identities += 1
+            elif command in INVOLUTIONS and operand == command:
+                del items[-2:]
+                self.identities += 1
+            else:
+                break
+
+    def merge(self, other: "ConstantFolder") -> None:
+        """Adds the counters of other to these.
+
+        Args:
+            other (ConstantFolder): a folder that folded other files.
+        """
+        self.folded += other.folded
+        self.identities += other.identities
+        self.commands_before += other.commands_before
+        self.commands_after += other.commands_after
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: how many operations were folded and dropped, and the
+            commands before and after folding.
+        """
+        return "folded: {}\nidentities dropped: {}\ncommands: {} -> {}".format(
+            self.folded, self.identities, self.commands_before,
+            self.commands_after)
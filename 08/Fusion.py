@@ -0,0 +1,125 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, C_ARITHMETIC, C_PUSH, C_POP
+from CodeWriter import CodeWriter, FUSED_OPERATORS
+
+# The patterns Fuser recognizes, in the order they are tried:
+# "update_in_place" - push S i, push constant k, add|sub, pop S i
+# "move" - push S i, pop T j
+# "constant_arithmetic" - push constant k, add|sub|and|or
+PATTERNS = ("update_in_place", "move", "constant_arithmetic")
+
+# Segments that can be popped, and so read and written in place.
+WRITABLE_SEGMENTS = ("local", "argument", "this", "that", "static", "temp",
+                     "pointer")
+
+
+class Fuser:
+    """
+    Translates common sequences of VM commands into single superinstructions
+    that keep intermediate values in D instead of pushing them to the stack.
+    Commands that are not part of a pattern are translated one by one.
+    """
+
+    def __init__(self) -> None:
+        """Creates a fuser that has not fused anything yet."""
+        # pattern -> how many times it was fused
+        self.counts = dict.fromkeys(PATTERNS, 0)
+
+    def translate(self, parser: Parser, code_writer: CodeWriter,
+                  translations: typing.Sequence[typing.Callable],
+                  on_command: typing.Optional[
+                      typing.Callable[[int], None]] = None) -> None:
+        """Translates all the commands of a parsed file.
+
+        Args:
+            parser (Parser): the parser of the file.
+            code_writer (CodeWriter): writes the translation.
+            translations (typing.Sequence[typing.Callable]): the translation
+                of each opcode, as Main.TRANSLATIONS, for unfused commands.
+            on_command (typing.Optional[typing.Callable[[int], None]]): if
+                given, called with the index of every command, or of the
+                first command of a fused sequence, before it is translated.
+        """
+        opcodes, args1, args2 = parser.opcodes, parser.args1, parser.args2
+        size = len(opcodes)
+        index = 0
+        while index < size:
+            opcode = opcodes[index]
+            if on_command is not None:
+                on_command(index)
+            if opcode == C_PUSH:
+                fused = self.fuse(code_writer, opcodes, args1, args2, index)
+                if fused:
+                    index += fused
+                    continue
+            translations[opcode](code_writer, args1[index], args2[index])
+            index += 1
+
+    def fuse(self, code_writer: CodeWriter, opcodes: typing.List[int],
+             args1: typing.List[str], args2: typing.List[int],
+             index: int) -> int:
+        """Writes the longest pattern that starts at a push, if any.
+
+        Args:
+            code_writer (CodeWriter): writes the translation.
+            opcodes (typing.List[int]): Parser.opcodes of the file.
+            args1 (typing.List[str]): Parser.args1 of the file.
+            args2 (typing.List[int]): Parser.args2 of the file.
+            index (int): the index of the push.
+
+        Returns:
+            int: the number of commands fused, 0 if no pattern matched.
+        """
+        size = len(opcodes)
+        segment, value = args1[index], args2[index]
+        if index + 3 < size and segment in WRITABLE_SEGMENTS \
+                and opcodes[index + 1] == C_PUSH \
+                and args1[index + 1] == "constant" \
+                and opcodes[index + 2] == C_ARITHMETIC \
+                and args1[index + 2] in ("add", "sub") \
+                and opcodes[index + 3] == C_POP \
+                and args1[index + 3] == segment \
+                and args2[index + 3] == value:
+            code_writer.write_update_in_place(
+                segment, value, args1[index + 2], args2[index + 1])
+            self.counts["update_in_place"] += 1
+            return 4
+        if index + 1 == size or (segment not in WRITABLE_SEGMENTS
+                                 and segment != "constant"):
+            return 0
+        if opcodes[index + 1] == C_POP \
+                and args1[index + 1] in WRITABLE_SEGMENTS:
+            code_writer.write_move(segment, value, args1[index + 1],
+                                   args2[index + 1])
+            self.counts["move"] += 1
+            return 2
+        if segment == "constant" and opcodes[index + 1] == C_ARITHMETIC \
+                and args1[index + 1] in FUSED_OPERATORS:
+            code_writer.write_constant_arithmetic(args1[index + 1], value)
+            self.counts["constant_arithmetic"] += 1
+            return 2
+        return 0
+
+    def merge(self, other: "Fuser") -> None:
+        """Adds the counts of other to these.
+
+        Args:
+            other (Fuser): a fuser that translated other files.
+        """
+        for pattern, amount in other.counts.items():
+            self.counts[pattern] += amount
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: how many times each pattern was fused, one per line.
+        """
+        return '\n'.join("fused {}: {}".format(pattern, self.counts[pattern])
+                         for pattern in PATTERNS)
@@ -0,0 +1,132 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import sys
+import typing
+
+# The assembler of project 6, whose encoding tables and symbol table are
+# used here. It is appended to the path, so modules of this project that
+# share a name with one there, like Parser and Main, are still found first.
+ASSEMBLER_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "06")
+if ASSEMBLER_DIRECTORY not in sys.path:
+    sys.path.append(ASSEMBLER_DIRECTORY)
+
+from Code import Code, a_instruction_table, c_instruction_table
+from SymbolTable import SymbolTable
+from HackImage import write_image, FORMAT_EXTENSIONS, BINARY_FORMATS
+
+
+class ImageBuilder:
+    """
+    Takes the place of the .asm output file of CodeWriter and assembles
+    what is written to it right away, so a ROM image is built without
+    writing the assembly to a file and parsing it again. Every instruction
+    is encoded as it arrives: numbers and C-instructions through the tables
+    of Code, labels into a SymbolTable at the current ROM address. Symbols
+    are only resolved in finish, once every label is known, and variables
+    get addresses in the order they first appear, as in the assembler.
+
+    CodeWriter writes one instruction per line without whitespace, and
+    comment lines that start with "//", which is all this expects.
+    """
+
+    def __init__(self, debug_file: typing.Optional[typing.TextIO] = None) \
+            -> None:
+        """
+        Args:
+            debug_file (typing.Optional[typing.TextIO]): if given, everything
+                written is also copied to it, as the .asm file would be.
+        """
+        self.debug_file = debug_file
+        self.symbol_table = SymbolTable()
+        # binary strings of the instructions, None where a symbol is pending
+        self.words = []
+        # (index in words, symbol) of every symbolic A-instruction
+        self.pending = []
+        # the end of the last write when it was not a whole line
+        self.partial_line = ""
+
+    def write(self, text: str) -> int:
+        """Assembles the instructions in text.
+
+        Args:
+            text (str): assembly, as CodeWriter writes it.
+
+        Returns:
+            int: the number of characters written.
+        """
+        if self.debug_file is not None:
+            self.debug_file.write(text)
+        lines = text.split('\n')
+        lines[0] = self.partial_line + lines[0]
+        self.partial_line = lines.pop()
+        words, pending = self.words, self.pending
+        a_words, c_words = a_instruction_table, c_instruction_table
+        for line in lines:
+            if not line or line[0] == '/':
+                continue
+            first = line[0]
+            if first == '@':
+                symbol = line[1:]
+                if symbol.isdigit():
+                    value = int(symbol)
+                    words.append(a_words[value] if value < 32768
+                                 else Code.a_instruction(value))
+                else:
+                    pending.append((len(words), symbol))
+                    words.append(None)
+            elif first == '(':
+                self.symbol_table.add_entry(line[1:-1], len(words))
+            else:
+                words.append(c_words[line])
+        return len(text)
+
+    @staticmethod
+    def seekable() -> bool:
+        """
+        Returns:
+            bool: False, like a pipe, nothing written can be read back.
+        """
+        return False
+
+    def finish(self) -> typing.List[str]:
+        """Resolves the symbols of the A-instructions.
+
+        Returns:
+            typing.List[str]: binary strings of all the instructions.
+        """
+        if self.partial_line:
+            self.write('\n')
+        symbol_table, words = self.symbol_table, self.words
+        a_words = a_instruction_table
+        for index, symbol in self.pending:
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, symbol_table.sym_index)
+                symbol_table.sym_index += 1
+            value = symbol_table.get_address(symbol)
+            words[index] = a_words[value] if value < 32768 \
+                else Code.a_instruction(value)
+        self.pending = []
+        return words
+
+    def write_image(self, output_path: str, image_format: str = "hack") \
+            -> int:
+        """Writes the ROM image of everything written.
+
+        Args:
+            output_path (str): the path of the image.
+            image_format (str): one of the keys of HackImage.FORMAT_EXTENSIONS.
+
+        Returns:
+            int: the number of bytes written.
+        """
+        words = self.finish()
+        mode = 'wb' if image_format in BINARY_FORMATS else 'w'
+        with open(output_path, mode) as output_file:
+            return write_image(words, output_file, image_format)
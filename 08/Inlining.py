@@ -0,0 +1,245 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, C_ARITHMETIC, C_PUSH, C_POP, C_FUNCTION, \
+    C_RETURN
+from CodeWriter import CodeWriter
+
+# Default bounds on the functions that are inlined: the commands of the body
+# without function and return, and the estimated cycles of an inlined call.
+DEFAULT_MAX_COMMANDS = 8
+DEFAULT_MAX_CYCLES = 80
+
+# Rough cycles of the translation of each command, for the cycle bound.
+PUSH_CYCLES = 8
+POP_CYCLES = 10
+UNARY_CYCLES = 4
+BINARY_CYCLES = 8
+COMPARISON_CYCLES = 20
+
+UNARY_COMMANDS = ("neg", "not", "shiftleft", "shiftright")
+COMPARISON_COMMANDS = ("eq", "gt", "lt")
+
+
+class InlineBody:
+    """A function that can be inlined, and how its frame is laid out."""
+
+    def __init__(self, file_name: str, n_vars: int,
+                 commands: typing.List[typing.Tuple[int, str, int]]) -> None:
+        """
+        Args:
+            file_name (str): the name of the file of the function, as given
+                to CodeWriter.set_file_name.
+            n_vars (int): the number of local variables of the function.
+            commands (typing.List[typing.Tuple[int, str, int]]): the opcode
+                and arguments of every command between function and return.
+        """
+        self.file_name = file_name
+        self.n_vars = n_vars
+        self.commands = commands
+        arguments = [arg2 for opcode, arg1, arg2 in commands
+                     if arg1 == "argument"]
+        # calls with fewer arguments than this cannot be inlined
+        self.min_args = max(arguments) + 1 if arguments else 0
+        # the pointers the body sets, saved around it like a call would
+        self.saved_pointers = sorted({arg2 for opcode, arg1, arg2 in commands
+                                      if opcode == C_POP
+                                      and arg1 == "pointer"})
+        # locals read before they are written need their initial 0
+        self.zeroed_locals = []
+        written = set()
+        for opcode, arg1, arg2 in commands:
+            if arg1 != "local" or arg2 in written:
+                continue
+            if opcode == C_PUSH:
+                self.zeroed_locals.append(arg2)
+            written.add(arg2)
+
+    def cycles(self, n_args: int) -> int:
+        """
+        Args:
+            n_args (int): the number of arguments of the call.
+
+        Returns:
+            int: the estimated cycles of the call when it is inlined.
+        """
+        cycles = n_args * POP_CYCLES + \
+            len(self.zeroed_locals) * (PUSH_CYCLES + POP_CYCLES) + \
+            len(self.saved_pointers) * 2 * (PUSH_CYCLES + POP_CYCLES)
+        for opcode, arg1, arg2 in self.commands:
+            if opcode == C_PUSH:
+                cycles += PUSH_CYCLES
+            elif opcode == C_POP:
+                cycles += POP_CYCLES
+            elif arg1 in UNARY_COMMANDS:
+                cycles += UNARY_CYCLES
+            elif arg1 in COMPARISON_COMMANDS:
+                cycles += COMPARISON_CYCLES
+            else:
+                cycles += BINARY_CYCLES
+        return cycles
+
+
+class Inliner:
+    """
+    Replaces calls of small leaf functions by their bodies. A function can
+    be inlined if its body is a straight line of push, pop and arithmetic
+    commands that ends with its only return, with exactly the return value
+    left on its stack. Every file of the program is added before any is
+    translated.
+
+    The arguments and locals of an inlined function live in static
+    variables named after it, which is safe because a leaf function never
+    runs twice at once. They take static memory like the static variables
+    of the program, which is shared with every other file.
+    """
+
+    def __init__(self, max_commands: int = DEFAULT_MAX_COMMANDS,
+                 max_cycles: int = DEFAULT_MAX_CYCLES) -> None:
+        """
+        Args:
+            max_commands (int): functions with more commands are not inlined.
+            max_cycles (int): calls that are estimated to take more cycles
+                when inlined are not inlined.
+        """
+        self.max_commands = max_commands
+        self.max_cycles = max_cycles
+        # function -> its InlineBody
+        self.bodies = {}
+        # function -> the call sites it was inlined at
+        self.counts = {}
+
+    def add_file(self, parser: Parser, file_name: str) -> None:
+        """Finds the functions of a parsed file that can be inlined.
+
+        Args:
+            parser (Parser): the parser of the file.
+            file_name (str): the name of the file, as given to
+                CodeWriter.set_file_name.
+        """
+        opcodes, args1, args2 = parser.opcodes, parser.args1, parser.args2
+        size = len(opcodes)
+        for index in range(size):
+            if opcodes[index] != C_FUNCTION:
+                continue
+            end = index + 1
+            depth = 0
+            while end < size:
+                opcode = opcodes[end]
+                if opcode == C_PUSH:
+                    depth += 1
+                elif opcode == C_POP:
+                    depth -= 1
+                elif opcode == C_ARITHMETIC:
+                    if args1[end] not in UNARY_COMMANDS:
+                        depth -= 1
+                else:
+                    break
+                if depth < 0:
+                    break
+                end += 1
+            if end < size and opcodes[end] == C_RETURN and depth == 1 \
+                    and end - index - 1 <= self.max_commands \
+                    and (end + 1 == size or opcodes[end + 1] == C_FUNCTION):
+                self.bodies[args1[index]] = InlineBody(
+                    file_name, args2[index],
+                    list(zip(opcodes[index + 1:end], args1[index + 1:end],
+                             args2[index + 1:end])))
+
+    def can_inline(self, function_name: str, n_args: int) -> bool:
+        """
+        Args:
+            function_name (str): the function called.
+            n_args (int): the number of arguments of the call.
+
+        Returns:
+            bool: True if the call is inlined.
+        """
+        body = self.bodies.get(function_name)
+        return body is not None and n_args >= body.min_args \
+            and body.cycles(n_args) <= self.max_cycles
+
+    def write_call(self, code_writer: CodeWriter, function_name: str,
+                   n_args: int) -> None:
+        """Writes a call, inlined if it can be.
+
+        Args:
+            code_writer (CodeWriter): writes the translation.
+            function_name (str): the function to call.
+            n_args (int): the number of arguments of the function.
+        """
+        if not self.can_inline(function_name, n_args):
+            code_writer.write_call(function_name, n_args)
+            return
+        body = self.bodies[function_name]
+        caller_file = code_writer.input_filename
+        frame = function_name + "$inline"
+        # the frame holds the arguments, then the locals, then the pointers
+        local_slots = n_args
+        pointer_slots = local_slots + body.n_vars
+
+        def write_frame(command: str, slot: int) -> None:
+            code_writer.input_filename = frame
+            code_writer.write_push_pop(command, "static", slot)
+            code_writer.input_filename = caller_file
+
+        code_writer.write_assembly("// inline " + function_name + " " +
+                                   str(n_args))
+        for slot in reversed(range(n_args)):
+            write_frame("C_POP", slot)
+        for index in body.zeroed_locals:
+            code_writer.write_push_pop("C_PUSH", "constant", 0)
+            write_frame("C_POP", local_slots + index)
+        for slot, index in enumerate(body.saved_pointers, pointer_slots):
+            code_writer.write_push_pop("C_PUSH", "pointer", index)
+            write_frame("C_POP", slot)
+        for opcode, arg1, arg2 in body.commands:
+            command = "C_PUSH" if opcode == C_PUSH else "C_POP"
+            if opcode == C_ARITHMETIC:
+                code_writer.write_arithmetic(arg1)
+            elif arg1 == "argument":
+                write_frame(command, arg2)
+            elif arg1 == "local":
+                write_frame(command, local_slots + arg2)
+            elif arg1 == "static":
+                code_writer.set_file_name(body.file_name)
+                code_writer.write_push_pop(command, arg1, arg2)
+                code_writer.input_filename = caller_file
+            else:
+                code_writer.write_push_pop(command, arg1, arg2)
+        for slot, index in enumerate(body.saved_pointers, pointer_slots):
+            write_frame("C_PUSH", slot)
+            code_writer.write_push_pop("C_POP", "pointer", index)
+        self.counts[function_name] = self.counts.get(function_name, 0) + 1
+
+    def merge(self, other: "Inliner") -> None:
+        """Adds the counts of other to these.
+
+        Args:
+            other (Inliner): a copy of this inliner that translated other
+                files.
+        """
+        for function_name, amount in other.counts.items():
+            self.counts[function_name] = \
+                self.counts.get(function_name, 0) + amount
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the functions that were inlined, one per line, with their
+            commands, estimated cycles per call and call sites.
+        """
+        lines = ["inlined {} calls of {} functions".format(
+            sum(self.counts.values()), len(self.counts))]
+        for function_name in sorted(self.counts):
+            body = self.bodies[function_name]
+            lines.append("inlined {}: {} commands, ~{} cycles, {} calls"
+                         .format(function_name, len(body.commands),
+                                 body.cycles(body.min_args),
+                                 self.counts[function_name]))
+        return '\n'.join(lines)
@@ -0,0 +1,206 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import os
+import re
+import typing
+from ImageBuilder import ImageBuilder
+# found through the path of the assembler, which ImageBuilder sets up
+from SymbolTable import SymbolTable
+from Profile import ROM_SIZE
+
+# File extension of object files, and the version of their format.
+OBJECT_EXTENSION = ".vmo"
+OBJECT_FORMAT = 1
+
+# Symbols the assembler defines, which are never labels of an object.
+PREDEFINED_SYMBOLS = frozenset(SymbolTable().sym_table)
+
+# How CodeWriter names static variables: the file, a dot and the index.
+STATIC_SYMBOL = re.compile(r".\.[0-9]+$")
+
+
+class ObjectFile:
+    """
+    The relocatable translation of a single VM file: its encoded
+    instructions as if the file started at ROM address 0, the labels it
+    defines, and the A-instructions the linker has to fill in. References to
+    its own labels are relocations, offsets the linker adds the address of
+    the object to. All other symbols are references, either to the labels of
+    other objects or to variables: the static variables of the file and the
+    scratch variables of CodeWriter, which get RAM addresses only when the
+    whole program is linked.
+    """
+
+    def __init__(self, name: str, words: typing.List[int],
+                 labels: typing.Dict[str, int],
+                 relocations: typing.List[typing.Tuple[int, int]],
+                 references: typing.List[typing.Tuple[int, str]],
+                 statics: typing.List[str],
+                 comparisons: typing.Iterable[str] = (),
+                 calls: typing.Iterable[str] = (), key: str = "") -> None:
+        """
+        Args:
+            name (str): the name of the object, used in error messages.
+            words (typing.List[int]): the instructions, 0 where the linker
+                fills in an address.
+            labels (typing.Dict[str, int]): label -> its offset in words.
+            relocations (typing.List[typing.Tuple[int, int]]): (index in
+                words, offset of a label of this object) pairs.
+            references (typing.List[typing.Tuple[int, str]]): (index in
+                words, symbol) pairs of every other symbolic A-instruction.
+            statics (typing.List[str]): the static variables among the
+                references, in the order they first appear.
+            comparisons (typing.Iterable[str]): the shared comparison
+                routines the object calls.
+            calls (typing.Iterable[str]): the shared call and return routines
+                the object calls.
+            key (str): a digest of everything the object was built from, so
+                it is only reused for the same source and options.
+        """
+        self.name = name
+        self.words = words
+        self.labels = labels
+        self.relocations = relocations
+        self.references = references
+        self.statics = statics
+        self.comparisons = sorted(comparisons)
+        self.calls = sorted(calls)
+        self.key = key
+
+    @classmethod
+    def from_builder(cls, name: str, builder: ImageBuilder,
+                     comparisons: typing.Iterable[str] = (),
+                     calls: typing.Iterable[str] = (),
+                     key: str = "") -> "ObjectFile":
+        """
+        Args:
+            name (str): the name of the object.
+            builder (ImageBuilder): what the translation was written to,
+                without calling its finish.
+            comparisons (typing.Iterable[str]): as in __init__.
+            calls (typing.Iterable[str]): as in __init__.
+            key (str): as in __init__.
+
+        Returns:
+            ObjectFile: the object of everything written to builder.
+        """
+        if builder.partial_line:
+            builder.write('\n')
+        labels = {symbol: address for symbol, address
+                  in builder.symbol_table.sym_table.items()
+                  if symbol not in PREDEFINED_SYMBOLS}
+        words = [0 if word is None else int(word, 2)
+                 for word in builder.words]
+        relocations, references, statics = [], [], []
+        for index, symbol in builder.pending:
+            if symbol in labels:
+                relocations.append((index, labels[symbol]))
+            elif symbol in PREDEFINED_SYMBOLS:
+                words[index] = builder.symbol_table.get_address(symbol)
+            else:
+                references.append((index, symbol))
+                if STATIC_SYMBOL.search(symbol) and symbol not in statics:
+                    statics.append(symbol)
+        return cls(name, words, labels, relocations, references, statics,
+                   comparisons, calls, key)
+
+    @classmethod
+    def read(cls, path: str) -> typing.Optional["ObjectFile"]:
+        """
+        Args:
+            path (str): the path of an object file.
+
+        Returns:
+            typing.Optional[ObjectFile]: the object, or None if there is no
+            such file or it is of another version of the format.
+        """
+        try:
+            with open(path, 'r') as input_file:
+                fields = json.load(input_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if fields.get("format") != OBJECT_FORMAT:
+            return None
+        return cls(fields["name"], fields["words"], fields["labels"],
+                   [tuple(pair) for pair in fields["relocations"]],
+                   [tuple(pair) for pair in fields["references"]],
+                   fields["statics"], fields["comparisons"], fields["calls"],
+                   fields["key"])
+
+    def write(self, path: str) -> None:
+        """Writes the object to a file, through a temporary file that is
+        renamed, so a build that is stopped never leaves half an object.
+
+        Args:
+            path (str): the path of the object file.
+        """
+        fields = {"format": OBJECT_FORMAT, "name": self.name,
+                  "key": self.key, "comparisons": self.comparisons,
+                  "calls": self.calls, "labels": self.labels,
+                  "statics": self.statics, "relocations": self.relocations,
+                  "references": self.references, "words": self.words}
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'w') as output_file:
+            json.dump(fields, output_file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+
+def object_path(objects_directory: str, input_path: str) -> str:
+    """
+    Args:
+        objects_directory (str): the directory of the object files.
+        input_path (str): a .vm file.
+
+    Returns:
+        str: the path of the object file of input_path.
+    """
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(objects_directory, name + OBJECT_EXTENSION)
+
+
+def link(objects: typing.List[ObjectFile]) -> typing.List[str]:
+    """Lays out the objects in ROM one after the other, resolves their
+    references and gives every symbol that is not a label a RAM address, in
+    the order the variables first appear, as the assembler would.
+
+    Args:
+        objects (typing.List[ObjectFile]): the objects, in ROM order.
+
+    Returns:
+        typing.List[str]: binary strings of all the instructions.
+    """
+    symbol_table = SymbolTable()
+    definitions = {}
+    bases = []
+    size = 0
+    for obj in objects:
+        bases.append(size)
+        for label, offset in obj.labels.items():
+            if label in definitions:
+                raise ValueError("label {} is defined in both {} and {}"
+                                 .format(label, definitions[label], obj.name))
+            definitions[label] = obj.name
+            symbol_table.add_entry(label, size + offset)
+        size += len(obj.words)
+    if size > ROM_SIZE:
+        raise ValueError("the program takes {} words, more than the {} of "
+                         "the ROM".format(size, ROM_SIZE))
+
+    words = []
+    for obj, base in zip(objects, bases):
+        code = list(obj.words)
+        for index, offset in obj.relocations:
+            code[index] = base + offset
+        for index, symbol in obj.references:
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, symbol_table.sym_index)
+                symbol_table.sym_index += 1
+            code[index] = symbol_table.get_address(symbol)
+        words.extend(code)
+    return [format(word, "016b") for word in words]
@@ -5,36 +5,68 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import contextlib
+import hashlib
+import io
 import os
 import sys
 import typing
-from Parser import Parser
-from CodeWriter import CodeWriter
+from concurrent.futures import ProcessPoolExecutor
+from Parser import Parser, COMMAND_TYPES, C_CALL, iterate_commands
+from Profile import RomProfile, ProfiledStream
+from Prologue import PrologueWriter, PROLOGUE_POLICIES, \
+    DEFAULT_ROUTINE_THRESHOLD, ZERO_ROUTINE_LABEL
+from CodeWriter import CodeWriter, write_shared_routines
+from CallGraph import CallGraph
+from Folding import ConstantFolder
+from Fusion import Fuser
+from Inlining import Inliner, DEFAULT_MAX_COMMANDS, DEFAULT_MAX_CYCLES
+from Stats import Stats, write_report
+from Streaming import BufferedStream
+from Templates import TemplateEngine
 
+# ImageBuilder and Linker use the assembler of project 6, whose encoding
+# tables take a while to build, so they are only imported by --image and
+# --objects.
+if typing.TYPE_CHECKING:
+    from Linker import ObjectFile
 
-import typing
+# The ROM image formats of --image, the keys of HackImage.FORMAT_EXTENSIONS.
+IMAGE_FORMATS = ("hack", "bin", "hex")
+
+# How each opcode is translated, indexed by the opcode. Every entry takes the
+# code writer and the two arguments of the command.
+TRANSLATIONS = (
+    lambda code_writer, arg1, arg2: code_writer.write_arithmetic(arg1),
+    lambda code_writer, arg1, arg2:
+        code_writer.write_push_pop("C_PUSH", arg1, arg2),
+    lambda code_writer, arg1, arg2:
+        code_writer.write_push_pop("C_POP", arg1, arg2),
+    lambda code_writer, arg1, arg2: code_writer.write_label(arg1),
+    lambda code_writer, arg1, arg2: code_writer.write_goto(arg1),
+    lambda code_writer, arg1, arg2: code_writer.write_if(arg1),
+    lambda code_writer, arg1, arg2: code_writer.write_function(arg1, arg2),
+    lambda code_writer, arg1, arg2: code_writer.write_return(),
+    lambda code_writer, arg1, arg2: code_writer.write_call(arg1, arg2),
+    # NO_COMMAND
+    lambda code_writer, arg1, arg2: None,
+)
 
-def translate_vm_instruction(parser, code_writer):
-    """Utility function to translate a single VM instruction using the parser and code_writer."""
-    command_type = parser.command_type()
-    action_map = {
-        "C_ARITHMETIC": lambda: code_writer.write_arithmetic(parser.arg1()),
-        "C_PUSH": lambda: code_writer.write_push_pop(command_type, parser.arg1(), parser.arg2()),
-        "C_POP": lambda: code_writer.write_push_pop(command_type, parser.arg1(), parser.arg2()),
-        "C_LABEL": lambda: code_writer.write_label(parser.arg1()),
-        "C_GOTO": lambda: code_writer.write_goto(parser.arg1()),
-        "C_IF": lambda: code_writer.write_if(parser.arg1()),
-        "C_FUNCTION": lambda: code_writer.write_function(parser.arg1(), parser.arg2()),
-        "C_RETURN": lambda: code_writer.write_return(),
-        "C_CALL": lambda: code_writer.write_call(parser.arg1(), parser.arg2()),
-    }
-    # Execute the corresponding function based on the command type
-    if command_type in action_map:
-        action_map[command_type]()
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        bootstrap: bool, stats: typing.Optional[Stats] = None,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        calls: typing.Optional[typing.Set[str]] = None,
+        fuser: typing.Optional[Fuser] = None,
+        cache_top: bool = False,
+        folder: typing.Optional[ConstantFolder] = None,
+        call_graph: typing.Optional[CallGraph] = None,
+        inliner: typing.Optional[Inliner] = None,
+        templates: typing.Optional[TemplateEngine] = None,
+        profile: typing.Optional[RomProfile] = None,
+        prologues: typing.Optional[PrologueWriter] = None) -> None:
 
     """Translates a single VM file to Hack assembly.
 
@@ -42,20 +74,550 @@ def translate_file(
         input_file (typing.TextIO): VM file to translate.
         output_file (typing.TextIO): Destination for Hack assembly code.
         bootstrap (bool): If True, includes bootstrap code for VM initialization.
+        stats (typing.Optional[Stats]): If given, collects the time of the
+            parse and emit phases and the translation counters.
+        comparisons (typing.Optional[typing.Set[str]]): If given, eq, gt and
+            lt call shared routines, and the comparisons called are added to
+            this set. The routines are written by write_shared_routines
+            once the whole program is translated.
+        calls (typing.Optional[typing.Set[str]]): Like comparisons, for the
+            shared routines of call and return.
+        fuser (typing.Optional[Fuser]): If given, translates common command
+            sequences as superinstructions and counts them.
+        cache_top (bool): If True, keeps the top of the stack in D between
+            commands.
+        folder (typing.Optional[ConstantFolder]): If given, folds constant
+            arithmetic and drops identity operations before translating.
+        call_graph (typing.Optional[CallGraph]): If given, the functions of
+            the file it did not find live are not translated, and the bytes
+            they would have taken are added to it.
+        inliner (typing.Optional[Inliner]): If given, calls of the small
+            functions it found are replaced by their bodies.
+        templates (typing.Optional[TemplateEngine]): If given, chooses the
+            code of pushes and pops and counts their instructions.
+        profile (typing.Optional[RomProfile]): If given, counts the
+            instructions written for every function and source line.
+        prologues (typing.Optional[PrologueWriter]): If given, writes the
+            code that zeroes the locals of every function and counts its
+            instructions.
     """
+    if stats is not None:
+        stats.start("parse")
     parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
+    if call_graph is not None:
+        removed = call_graph.remove_dead_functions(parser)
+        if removed:
+            saved = translated_size(removed, input_file.name,
+                                    comparisons is not None,
+                                    calls is not None, cache_top, fuser,
+                                    folder, templates, prologues)
+            call_graph.bytes_saved += saved
+            if stats is not None:
+                stats.count("dead_commands_removed", len(removed))
+                stats.count("dead_bytes_saved", saved)
+    if folder is not None:
+        if stats is not None:
+            stats.start("fold")
+            commands_before = len(parser.opcodes)
+        parser.replace_commands(folder.fold(parser.input_lines))
+        if stats is not None:
+            stats.count("folded_commands_removed",
+                        commands_before - len(parser.opcodes))
+    on_command = None
+    if profile is not None:
+        output_file = ProfiledStream(output_file, profile,
+                                     os.path.basename(input_file.name),
+                                     parser)
+        on_command = output_file.start
+    if stats is not None:
+        stats.start("emit")
+        first_byte = output_file.tell() if output_file.seekable() else 0
+    code_writer = CodeWriter(output_file, comparisons, calls, cache_top,
+                             templates, prologues)
 
     if bootstrap:
         code_writer.write_initlizaiton()
 
     code_writer.set_file_name(input_file.name)
 
+    translations = TRANSLATIONS
+    if inliner is not None:
+        inlined_before = sum(inliner.counts.values())
+        translations = TRANSLATIONS[:C_CALL] + (
+            lambda code_writer, arg1, arg2:
+                inliner.write_call(code_writer, arg1, arg2),
+        ) + TRANSLATIONS[C_CALL + 1:]
+
     # Translate each VM command to assembly
-    while parser.has_more_commands():
-        parser.current_line_index += 1
-        parser.advance()
-        translate_vm_instruction(parser, code_writer)
+    if fuser is None and on_command is None:
+        for opcode, arg1, arg2 in zip(parser.opcodes, parser.args1,
+                                      parser.args2):
+            translations[opcode](code_writer, arg1, arg2)
+    elif fuser is None:
+        for index, (opcode, arg1, arg2) in enumerate(
+                zip(parser.opcodes, parser.args1, parser.args2)):
+            on_command(index)
+            translations[opcode](code_writer, arg1, arg2)
+    else:
+        fused_before = dict(fuser.counts)
+        fuser.translate(parser, code_writer, translations, on_command)
+    code_writer.spill_top()
+
+    if stats is not None:
+        stats.end()
+        count_commands(stats, parser)
+        stats.count("comparison_labels", code_writer.counter_for_labels)
+        stats.count("return_labels", code_writer.counter_for_call)
+        if fuser is not None:
+            for pattern, amount in fuser.counts.items():
+                stats.count("fused_" + pattern,
+                            amount - fused_before[pattern])
+        if inliner is not None:
+            stats.count("inlined_calls",
+                        sum(inliner.counts.values()) - inlined_before)
+        if output_file.seekable():
+            stats.count("bytes_written", output_file.tell() - first_byte)
+
+
+def translate_stream(
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        bootstrap: bool, stats: typing.Optional[Stats] = None,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        calls: typing.Optional[typing.Set[str]] = None,
+        cache_top: bool = False,
+        templates: typing.Optional[TemplateEngine] = None,
+        prologues: typing.Optional[PrologueWriter] = None) -> None:
+    """Translates a single VM file like translate_file, one command at a
+    time: commands come from iterate_commands and the code goes through a
+    BufferedStream, so memory use does not grow with the size of the file.
+    The passes that need the whole file, like folding, fusion and inlining,
+    are not available.
+
+    Args:
+        input_file (typing.TextIO): VM file to translate.
+        output_file (typing.TextIO): Destination for Hack assembly code.
+        bootstrap (bool): If True, includes bootstrap code for VM
+            initialization.
+        stats (typing.Optional[Stats]): If given, collects the time of the
+            emit phase, which includes parsing, and the translation counters.
+        comparisons (typing.Optional[typing.Set[str]]): as in translate_file.
+        calls (typing.Optional[typing.Set[str]]): as in translate_file.
+        cache_top (bool): as in translate_file.
+        templates (typing.Optional[TemplateEngine]): as in translate_file.
+        prologues (typing.Optional[PrologueWriter]): as in translate_file.
+    """
+    if stats is not None:
+        stats.start("emit")
+    buffered_file = BufferedStream(output_file)
+    code_writer = CodeWriter(buffered_file, comparisons, calls, cache_top,
+                             templates, prologues)
+    if bootstrap:
+        code_writer.write_initlizaiton()
+    code_writer.set_file_name(input_file.name)
+
+    translations = TRANSLATIONS
+    if stats is None:
+        for opcode, arg1, arg2 in iterate_commands(input_file):
+            translations[opcode](code_writer, arg1, arg2)
+    else:
+        counts = [0] * len(COMMAND_TYPES)
+        for opcode, arg1, arg2 in iterate_commands(input_file):
+            counts[opcode] += 1
+            translations[opcode](code_writer, arg1, arg2)
+    code_writer.spill_top()
+    buffered_file.flush()
+
+    if stats is not None:
+        stats.end()
+        stats.count("commands", sum(counts))
+        for command_type, amount in zip(COMMAND_TYPES, counts):
+            if amount:
+                stats.count(str(command_type), amount)
+        stats.count("comparison_labels", code_writer.counter_for_labels)
+        stats.count("return_labels", code_writer.counter_for_call)
+        stats.count("bytes_written", buffered_file.characters_written)
+        stats.count("output_writes", buffered_file.writes)
+
+
+def translated_size(commands: typing.List[str], file_name: str,
+                    shared_comparisons: bool, compact_calls: bool,
+                    cache_top: bool, fuser: typing.Optional[Fuser] = None,
+                    folder: typing.Optional[ConstantFolder] = None,
+                    templates: typing.Optional[TemplateEngine] = None,
+                    prologues: typing.Optional[PrologueWriter] = None) \
+        -> int:
+    """The passes that are given are run through new instances of the
+    same kind and settings, so the counters of the given ones do not count
+    code that is never written.
+
+    Args:
+        commands (typing.List[str]): VM commands.
+        file_name (str): the name of the file they come from.
+        shared_comparisons (bool): translate eq, gt and lt as shared calls.
+        compact_calls (bool): translate call and return as shared calls.
+        cache_top (bool): keep the top of the stack in D.
+        fuser (typing.Optional[Fuser]): if given, fuse the commands.
+        folder (typing.Optional[ConstantFolder]): if given, fold the
+            commands first.
+        templates (typing.Optional[TemplateEngine]): if given, choose the
+            code of pushes and pops.
+        prologues (typing.Optional[PrologueWriter]): if given, zero the
+            locals with its policy and threshold.
+
+    Returns:
+        int: the bytes of assembly the commands translate to on their own.
+    """
+    output_file = io.StringIO()
+    parser = Parser(io.StringIO('\n'.join(commands)))
+    if folder is not None:
+        parser.replace_commands(ConstantFolder().fold(parser.input_lines))
+    code_writer = CodeWriter(
+        output_file, set() if shared_comparisons else None,
+        set() if compact_calls else None, cache_top,
+        TemplateEngine() if templates is not None else None,
+        PrologueWriter(prologues.policy, prologues.threshold)
+        if prologues is not None else None)
+    code_writer.set_file_name(file_name)
+    if fuser is None:
+        for opcode, arg1, arg2 in zip(parser.opcodes, parser.args1,
+                                      parser.args2):
+            TRANSLATIONS[opcode](code_writer, arg1, arg2)
+    else:
+        Fuser().translate(parser, code_writer, TRANSLATIONS)
+    code_writer.spill_top()
+    return len(output_file.getvalue())
+
+
+def translate_job(
+        input_path: str, bootstrap: bool, collect_stats: bool,
+        shared_comparisons: bool, compact_calls: bool, fuse: bool,
+        cache_top: bool, fold: bool,
+        call_graph: typing.Optional[CallGraph],
+        inliner: typing.Optional[Inliner],
+        templates: typing.Optional[TemplateEngine],
+        profile: typing.Optional[RomProfile],
+        prologues: typing.Optional[PrologueWriter]) -> typing.Tuple[
+            str, typing.Optional[typing.Set[str]],
+            typing.Optional[typing.Set[str]], typing.Optional[Fuser],
+            typing.Optional[ConstantFolder], typing.Optional[CallGraph],
+            typing.Optional[Inliner], typing.Optional[TemplateEngine],
+            typing.Optional[RomProfile], typing.Optional[PrologueWriter],
+            typing.Optional[Stats]]:
+    """Runs translate_file in a worker process, into a buffer instead of
+    the shared output file.
+
+    Returns:
+        typing.Tuple[str, ...]: the assembly of the file, followed by the
+        comparisons and calls it used, its fuser, folder, call graph,
+        inliner, template engine, profile and prologue writer, and its
+        statistics, each None if the matching option is off.
+    """
+    output_file = io.StringIO()
+    stats = Stats() if collect_stats else None
+    comparisons = set() if shared_comparisons else None
+    calls = set() if compact_calls else None
+    fuser = Fuser() if fuse else None
+    folder = ConstantFolder() if fold else None
+    with open(input_path, 'r') as input_file:
+        translate_file(input_file, output_file, bootstrap, stats,
+                       comparisons, calls, fuser, cache_top, folder,
+                       call_graph, inliner, templates, profile, prologues)
+    return output_file.getvalue(), comparisons, calls, fuser, folder, \
+        call_graph, inliner, templates, profile, prologues, stats
+
+
+def translate_in_parallel(
+        input_paths: typing.List[str], output_file: typing.TextIO,
+        jobs: int,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        calls: typing.Optional[typing.Set[str]] = None,
+        fuser: typing.Optional[Fuser] = None,
+        cache_top: bool = False,
+        folder: typing.Optional[ConstantFolder] = None,
+        call_graph: typing.Optional[CallGraph] = None,
+        inliner: typing.Optional[Inliner] = None,
+        templates: typing.Optional[TemplateEngine] = None,
+        profile: typing.Optional[RomProfile] = None,
+        prologues: typing.Optional[PrologueWriter] = None,
+        stats_by_file: typing.Optional[typing.Dict[str, Stats]] = None) \
+        -> None:
+    """Translates files in a pool of worker processes. Every file has its
+    own CodeWriter, and so its own labels, just as when the files are
+    translated one after the other. The translations are written in the
+    order of input_paths with the bootstrap in front of the first one, so
+    the output is the same for any number of jobs.
+
+    Args:
+        input_paths (typing.List[str]): the .vm files, in output order.
+        output_file (typing.TextIO): receives the whole translation.
+        jobs (int): the number of worker processes.
+        comparisons (typing.Optional[typing.Set[str]]): as in translate_file,
+            receives the comparisons called by all the files.
+        calls (typing.Optional[typing.Set[str]]): as in translate_file.
+        fuser (typing.Optional[Fuser]): if given, fuses commands and receives
+            the counts of all the files.
+        cache_top (bool): as in translate_file.
+        folder (typing.Optional[ConstantFolder]): if given, folds constants
+            and receives the counters of all the files.
+        call_graph (typing.Optional[CallGraph]): if given, a call graph of
+            all the files after find_live, it receives the counters of all
+            the files.
+        inliner (typing.Optional[Inliner]): if given, an inliner that all
+            the files were added to, it receives the counts of all the files.
+        templates (typing.Optional[TemplateEngine]): if given, chooses the
+            code of pushes and pops and receives the counters of all the
+            files.
+        profile (typing.Optional[RomProfile]): if given, receives the
+            instructions written for every function of all the files.
+        prologues (typing.Optional[PrologueWriter]): if given, writes the
+            prologues and receives the counters of all the files.
+        stats_by_file (typing.Optional[typing.Dict[str, Stats]]): if given,
+            the statistics of every file are stored in it, by input path.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(translate_job, input_path, index == 0,
+                            stats_by_file is not None,
+                            comparisons is not None, calls is not None,
+                            fuser is not None, cache_top, folder is not None,
+                            call_graph, inliner, templates, profile,
+                            prologues)
+            for index, input_path in enumerate(input_paths)]
+        for input_path, future in zip(input_paths, futures):
+            text, file_comparisons, file_calls, file_fuser, file_folder, \
+                file_call_graph, file_inliner, file_templates, \
+                file_profile, file_prologues, stats = future.result()
+            output_file.write(text)
+            if comparisons is not None:
+                comparisons.update(file_comparisons)
+            if calls is not None:
+                calls.update(file_calls)
+            if fuser is not None:
+                fuser.merge(file_fuser)
+            if folder is not None:
+                folder.merge(file_folder)
+            if call_graph is not None:
+                call_graph.merge(file_call_graph)
+            if inliner is not None:
+                inliner.merge(file_inliner)
+            if templates is not None:
+                templates.merge(file_templates)
+            if profile is not None:
+                profile.merge(file_profile)
+            if prologues is not None:
+                prologues.merge(file_prologues)
+            if stats_by_file is not None:
+                stats_by_file[input_path] = stats
+
+
+# The modules that determine the translated code, and the modules of the
+# assembler of project 6 that encode the instructions of object files.
+TRANSLATOR_SOURCES = (
+    "Main.py", "Parser.py", "CodeWriter.py", "Folding.py", "Fusion.py",
+    "Templates.py", "Prologue.py", "ImageBuilder.py", "Linker.py")
+ASSEMBLER_SOURCES = (
+    os.path.join(os.pardir, "06", "Code.py"),
+    os.path.join(os.pardir, "06", "SymbolTable.py"),
+    os.path.join(os.pardir, "06", "HackImage.py"))
+
+
+def translator_version() -> str:
+    """
+    Returns:
+        str: a digest of the sources of the translator and of the parts of
+        the assembler it uses, so that object files made by a different
+        version of either are never used.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for source in TRANSLATOR_SOURCES + ASSEMBLER_SOURCES:
+        with open(os.path.join(directory, source), 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def source_digest(input_path: str, *salt: str) -> str:
+    """
+    Args:
+        input_path (str): the file to hash.
+        *salt (str): strings that are hashed before the content of the file.
+
+    Returns:
+        str: the hex SHA-256 digest of the salt and the content of the file.
+    """
+    digest = hashlib.sha256()
+    for part in salt:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    with open(input_path, 'rb') as input_file:
+        digest.update(input_file.read())
+    return digest.hexdigest()
+
+
+def translate_object(
+        input_path: str, key: str, collect_stats: bool,
+        shared_comparisons: bool, compact_calls: bool, fuse: bool,
+        cache_top: bool, fold: bool,
+        templates: typing.Optional[TemplateEngine],
+        prologues: typing.Optional[PrologueWriter]) -> typing.Tuple[
+            "ObjectFile", typing.Optional[Fuser],
+            typing.Optional[ConstantFolder], typing.Optional[TemplateEngine],
+            typing.Optional[PrologueWriter], typing.Optional[Stats]]:
+    """Translates a single VM file to a relocatable object. This is the
+    unit of work of the worker processes in build_objects.
+
+    Returns:
+        typing.Tuple[ObjectFile, ...]: the object, followed by its fuser,
+        folder, template engine and prologue writer, and its statistics,
+        each None if the matching option is off.
+    """
+    from ImageBuilder import ImageBuilder
+    from Linker import ObjectFile
+    builder = ImageBuilder()
+    stats = Stats() if collect_stats else None
+    comparisons = set() if shared_comparisons else None
+    calls = set() if compact_calls else None
+    fuser = Fuser() if fuse else None
+    folder = ConstantFolder() if fold else None
+    with open(input_path, 'r') as input_file:
+        translate_file(input_file, builder, False, stats, comparisons, calls,
+                       fuser, cache_top, folder, templates=templates,
+                       prologues=prologues)
+    obj = ObjectFile.from_builder(os.path.basename(input_path), builder,
+                                  comparisons or (), calls or (), key)
+    return obj, fuser, folder, templates, prologues, stats
+
+
+def build_objects(
+        input_paths: typing.List[str], objects_directory: str, jobs: int,
+        comparisons: typing.Optional[typing.Set[str]] = None,
+        calls: typing.Optional[typing.Set[str]] = None,
+        fuser: typing.Optional[Fuser] = None,
+        cache_top: bool = False,
+        folder: typing.Optional[ConstantFolder] = None,
+        templates: typing.Optional[TemplateEngine] = None,
+        prologues: typing.Optional[PrologueWriter] = None,
+        stats_by_file: typing.Optional[typing.Dict[str, Stats]] = None) \
+        -> typing.List["ObjectFile"]:
+    """Brings the object file of every VM file up to date, translating
+    only the files whose source, options or translator changed since their
+    object was written, and builds the objects of the bootstrap and of the
+    shared routines the program calls.
+
+    Args:
+        input_paths (typing.List[str]): the .vm files, in ROM order.
+        objects_directory (str): the directory of the object files, created
+            on demand.
+        jobs (int): the number of worker processes.
+        comparisons (typing.Optional[typing.Set[str]]): as in
+            translate_in_parallel.
+        calls (typing.Optional[typing.Set[str]]): as in translate_file.
+        fuser (typing.Optional[Fuser]): if given, fuses commands and receives
+            the counts of the files translated.
+        cache_top (bool): as in translate_file.
+        folder (typing.Optional[ConstantFolder]): if given, folds constants
+            and receives the counters of the files translated.
+        templates (typing.Optional[TemplateEngine]): if given, chooses the
+            code of pushes and pops and receives the counters of the files
+            translated.
+        prologues (typing.Optional[PrologueWriter]): if given, writes the
+            prologues and receives the counters of the files translated.
+        stats_by_file (typing.Optional[typing.Dict[str, Stats]]): if given,
+            the statistics of every file translated are stored in it, by
+            input path.
+
+    Returns:
+        typing.List[ObjectFile]: the objects to link, in ROM order.
+    """
+    from ImageBuilder import ImageBuilder
+    from Linker import ObjectFile, object_path
+    os.makedirs(objects_directory, exist_ok=True)
+    options = repr((comparisons is not None, calls is not None,
+                    fuser is not None, cache_top, folder is not None,
+                    templates is not None,
+                    prologues and (prologues.policy, prologues.threshold)))
+    version = translator_version()
+    objects = {}
+    stale = []
+    for input_path in input_paths:
+        key = source_digest(input_path, version, input_path, options)
+        obj = ObjectFile.read(object_path(objects_directory, input_path))
+        if obj is not None and obj.key == key:
+            objects[input_path] = obj
+        else:
+            stale.append((input_path, key))
+
+    job_arguments = [
+        (input_path, key, stats_by_file is not None, comparisons is not None,
+         calls is not None, fuser is not None, cache_top, folder is not None,
+         templates, prologues) for input_path, key in stale]
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 \
+            and len(stale) > 1 else contextlib.nullcontext() as executor:
+        if executor is None:
+            results = (translate_object(*arguments)
+                       for arguments in job_arguments)
+        else:
+            results = [executor.submit(translate_object, *arguments)
+                       for arguments in job_arguments]
+            results = (future.result() for future in results)
+        for (input_path, key), result in zip(stale, results):
+            obj, file_fuser, file_folder, file_templates, file_prologues, \
+                stats = result
+            obj.write(object_path(objects_directory, input_path))
+            objects[input_path] = obj
+            if fuser is not None:
+                fuser.merge(file_fuser)
+            if folder is not None:
+                folder.merge(file_folder)
+            # a worker counts into copies of templates and prologues, which
+            # are merged back
+            if templates is not None and executor is not None:
+                templates.merge(file_templates)
+            if prologues is not None and executor is not None:
+                prologues.merge(file_prologues)
+            if stats_by_file is not None:
+                stats_by_file[input_path] = stats
+
+    builder = ImageBuilder()
+    code_writer = CodeWriter(builder, comparisons, calls, cache_top,
+                             templates, prologues)
+    code_writer.write_initlizaiton()
+    bootstrap = ObjectFile.from_builder("bootstrap", builder)
+    for obj in objects.values():
+        if comparisons is not None:
+            comparisons.update(obj.comparisons)
+        if calls is not None:
+            calls.update(obj.calls)
+        # objects that were not translated again only show their use of
+        # the zeroing routine in their references
+        if prologues is not None and any(
+                symbol == ZERO_ROUTINE_LABEL
+                for index, symbol in obj.references):
+            prologues.routine_used = True
+    builder = ImageBuilder()
+    write_shared_routines(builder, comparisons, calls, prologues)
+    routines = ObjectFile.from_builder("shared routines", builder)
+    print("Translated {} of {} files with {} jobs ({} objects up to date), "
+          "{} static variables".format(
+              len(stale), len(input_paths), jobs,
+              len(input_paths) - len(stale),
+              len(set().union(*(obj.statics for obj in objects.values())))))
+    return [bootstrap] + [objects[input_path] for input_path in input_paths] \
+        + [routines]
+
+
+def count_commands(stats: Stats, parser: Parser) -> None:
+    """Counts the commands of a parsed file by type.
+
+    Args:
+        stats (Stats): receives the counts.
+        parser (Parser): the parser of the file.
+    """
+    stats.count("commands", len(parser.opcodes))
+    for opcode, command_type in enumerate(COMMAND_TYPES):
+        amount = parser.opcodes.count(opcode)
+        if amount:
+            stats.count(str(command_type), amount)
 
 
 if "__main__" == __name__:
@@ -64,25 +626,226 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="VMtranslator")
+    arg_parser.add_argument("input_path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="print per-phase times and counters as JSON")
+    arg_parser.add_argument(
+        "--stats-file", metavar="PATH",
+        help="write the --stats report to PATH instead of printing it")
+    arg_parser.add_argument(
+        "--shared-comparisons", action="store_true",
+        help="translate eq, gt and lt to calls of routines written once "
+             "per program instead of inlining them")
+    arg_parser.add_argument(
+        "--compact-calls", action="store_true",
+        help="translate call and return to jumps into routines written "
+             "once per program instead of inlining them")
+    arg_parser.add_argument(
+        "--fuse", action="store_true",
+        help="translate common command sequences as superinstructions that "
+             "do not use the stack, and report how often each one fired")
+    arg_parser.add_argument(
+        "--cache-top", action="store_true",
+        help="keep the top of the stack in D between commands, writing it "
+             "to the stack only where control flow meets")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="evaluate arithmetic on constants and drop operations that do "
+             "not change the stack before translating")
+    arg_parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="number of files to translate at once, 0 uses every CPU; the "
+             "output does not depend on it (default: 1)")
+    arg_parser.add_argument(
+        "--remove-dead-functions", action="store_true",
+        help="leave out functions that cannot be called from Sys.init and "
+             "report the bytes saved")
+    arg_parser.add_argument(
+        "--inline", action="store_true",
+        help="replace calls of small leaf functions by their bodies and "
+             "report the functions inlined")
+    arg_parser.add_argument(
+        "--inline-max-commands", type=int, default=DEFAULT_MAX_COMMANDS,
+        metavar="N",
+        help="only inline functions of up to N commands (default: "
+             "%(default)s)")
+    arg_parser.add_argument(
+        "--inline-max-cycles", type=int, default=DEFAULT_MAX_CYCLES,
+        metavar="N",
+        help="only inline calls estimated to take up to N cycles once "
+             "inlined (default: %(default)s)")
+    arg_parser.add_argument(
+        "--specialize", action="store_true",
+        help="choose the shortest code for every push and pop and report "
+             "the instructions saved against the generic code (--cache-top "
+             "has code of its own)")
+    arg_parser.add_argument(
+        "--prologue", choices=PROLOGUE_POLICIES, default="unrolled",
+        help="how functions zero their locals: a push for each one, the "
+             "fastest code, or the smallest code, which calls a shared "
+             "routine for functions with many locals (default: "
+             "%(default)s)")
+    arg_parser.add_argument(
+        "--prologue-threshold", type=int, default=DEFAULT_ROUTINE_THRESHOLD,
+        metavar="N",
+        help="with --prologue size, call the shared routine in functions "
+             "of more than N locals (default: %(default)s)")
+    arg_parser.add_argument(
+        "--rom-report", metavar="PATH",
+        help="write the ROM words and instruction mix of every function to "
+             "PATH, as CSV if it ends with .csv and JSON otherwise, and fail "
+             "if the program does not fit in the ROM")
+    arg_parser.add_argument(
+        "--image", choices=IMAGE_FORMATS,
+        help="assemble the translation in this process and write a ROM "
+             "image in this format instead of the .asm file")
+    arg_parser.add_argument(
+        "--keep-asm", action="store_true",
+        help="with --image, also write the .asm file for debugging")
+    arg_parser.add_argument(
+        "--objects", metavar="DIR",
+        help="translate every file to a relocatable object in DIR, only "
+             "retranslating files that changed since their object was "
+             "written, and link the objects into a ROM image (default "
+             "format: hack)")
+    arg_parser.add_argument(
+        "--streaming", action="store_true",
+        help="parse and translate one command at a time and write the "
+             "output in large chunks, so memory use does not grow with the "
+             "input; only for options that do not need the whole program")
+    args = arg_parser.parse_args()
+    if args.streaming:
+        for option, name in ((args.fold, "--fold"), (args.fuse, "--fuse"),
+                             (args.remove_dead_functions,
+                              "--remove-dead-functions"),
+                             (args.inline, "--inline"),
+                             (args.rom_report, "--rom-report"),
+                             (args.objects, "--objects"),
+                             (args.jobs != 1, "--jobs")):
+            if option:
+                arg_parser.error("--streaming cannot be used with " + name)
+    if args.objects is not None:
+        for option, name in ((args.remove_dead_functions,
+                              "--remove-dead-functions"),
+                             (args.inline, "--inline"),
+                             (args.rom_report, "--rom-report"),
+                             (args.keep_asm, "--keep-asm")):
+            if option:
+                arg_parser.error("--objects cannot be used with " + name)
+    stats_by_file = {} if args.stats or args.stats_file else None
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
         output_path = os.path.join(argument_path, os.path.basename(
             argument_path))
     else:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
-    output_path += ".asm"
-    bootstrap = True
-    with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
+    comparisons = set() if args.shared_comparisons else None
+    calls = set() if args.compact_calls else None
+    fuser = Fuser() if args.fuse else None
+    folder = ConstantFolder() if args.fold else None
+    input_paths = [input_path for input_path in files_to_translate
+                   if os.path.splitext(input_path)[1].lower() == ".vm"]
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    call_graph = CallGraph() if args.remove_dead_functions else None
+    inliner = Inliner(args.inline_max_commands, args.inline_max_cycles) \
+        if args.inline else None
+    templates = TemplateEngine() if args.specialize else None
+    profile = RomProfile() if args.rom_report else None
+    prologues = None if args.prologue == "unrolled" \
+        else PrologueWriter(args.prologue, args.prologue_threshold)
+    if call_graph is not None or inliner is not None:
+        parsers = {}
+        for input_path in input_paths:
             with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+                parsers[input_path] = Parser(input_file)
+        if inliner is not None:
+            for input_path, parser in parsers.items():
+                inliner.add_file(parser, input_path)
+        if call_graph is not None:
+            for parser in parsers.values():
+                call_graph.add_file(parser, inliner)
+            call_graph.find_live()
+    if args.objects is not None:
+        from ImageBuilder import FORMAT_EXTENSIONS, BINARY_FORMATS, \
+            write_image
+        from Linker import link
+        image_format = args.image or "hack"
+        objects = build_objects(input_paths, args.objects, jobs, comparisons,
+                                calls, fuser, args.cache_top, folder,
+                                templates, prologues, stats_by_file)
+        try:
+            words = link(objects)
+        except ValueError as error:
+            print(output_path + ": " + str(error), file=sys.stderr)
+            sys.exit(1)
+        with open(output_path + FORMAT_EXTENSIONS[image_format],
+                  'wb' if image_format in BINARY_FORMATS else 'w') \
+                as image_file:
+            write_image(words, image_file, image_format)
+    else:
+        if args.image is not None:
+            from ImageBuilder import ImageBuilder, FORMAT_EXTENSIONS
+        write_asm = args.image is None or args.keep_asm
+        with open(output_path + ".asm", 'w') if write_asm \
+                else contextlib.nullcontext() as asm_file:
+            output_file = asm_file if args.image is None \
+                else ImageBuilder(asm_file)
+            if jobs > 1 and len(input_paths) > 1:
+                translate_in_parallel(input_paths, output_file, jobs,
+                                      comparisons, calls, fuser,
+                                      args.cache_top, folder, call_graph,
+                                      inliner, templates, profile,
+                                      prologues, stats_by_file)
+            else:
+                bootstrap = True
+                for input_path in input_paths:
+                    stats = None
+                    if stats_by_file is not None:
+                        stats = stats_by_file[input_path] = Stats()
+                    with open(input_path, 'r') as input_file:
+                        if args.streaming:
+                            translate_stream(input_file, output_file,
+                                             bootstrap, stats, comparisons,
+                                             calls, args.cache_top,
+                                             templates, prologues)
+                        else:
+                            translate_file(input_file, output_file,
+                                           bootstrap, stats, comparisons,
+                                           calls, fuser, args.cache_top,
+                                           folder, call_graph, inliner,
+                                           templates, profile, prologues)
+                    bootstrap = False
+            write_shared_routines(
+                output_file if profile is None
+                else ProfiledStream(output_file, profile, ""),
+                comparisons, calls, prologues)
+        overflow = None
+        if profile is not None:
+            profile.write_report(args.rom_report)
+            overflow = profile.overflow_message()
+        if overflow is not None:
+            print(output_path + ": " + overflow, file=sys.stderr)
+            sys.exit(1)
+        if args.image is not None:
+            output_file.write_image(
+                output_path + FORMAT_EXTENSIONS[args.image], args.image)
+    if prologues is not None:
+        print(prologues.report())
+    if templates is not None:
+        print(templates.report())
+    if inliner is not None:
+        print(inliner.report())
+    if call_graph is not None:
+        print(call_graph.report())
+    if folder is not None:
+        print(folder.report())
+    if fuser is not None:
+        print(fuser.report())
+    if stats_by_file is not None:
+        write_report("vm_translator", stats_by_file, args.stats_file or "-")
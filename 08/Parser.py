@@ -5,6 +5,7 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import sys
 import typing
 
 
@@ -14,7 +15,65 @@ def removing_comments(input_lines):
 
 
 def removing_whitespaces(input_lines):
-    return [line for line in input_lines if line != ""]
+    return [line for line in input_lines if line.strip()]
+
+
+# Opcodes of the parsed commands, stored in Parser.opcodes.
+C_ARITHMETIC = 0
+C_PUSH = 1
+C_POP = 2
+C_LABEL = 3
+C_GOTO = 4
+C_IF = 5
+C_FUNCTION = 6
+C_RETURN = 7
+C_CALL = 8
+# A line that is not a VM command, it is never translated.
+NO_COMMAND = 9
+
+COMMAND_TYPES = ("C_ARITHMETIC", "C_PUSH", "C_POP", "C_LABEL", "C_GOTO",
+                 "C_IF", "C_FUNCTION", "C_RETURN", "C_CALL", None)
+
+ARITHMETIC_COMMANDS = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or",
+                       "not", "shiftleft", "shiftright")
+
+# The first word of a command -> its opcode.
+OPCODES = {"push": C_PUSH, "pop": C_POP, "label": C_LABEL, "goto": C_GOTO,
+           "if-goto": C_IF, "function": C_FUNCTION, "return": C_RETURN,
+           "call": C_CALL}
+OPCODES.update((command, C_ARITHMETIC) for command in ARITHMETIC_COMMANDS)
+
+# Opcodes of the commands that have an integer second argument.
+INT_ARGUMENT_OPCODES = (C_PUSH, C_POP, C_FUNCTION, C_CALL)
+
+
+def iterate_commands(input_file: typing.TextIO) -> typing.Iterator[
+        typing.Tuple[int, typing.Optional[str], typing.Optional[int]]]:
+    """Yields the commands of a VM file one line at a time, tokenized like
+    Parser.parse_commands does, without holding the file in memory.
+
+    Args:
+        input_file (typing.TextIO): input file.
+
+    Returns:
+        typing.Iterator[typing.Tuple[int, typing.Optional[str],
+        typing.Optional[int]]]: the opcode and the two arguments of every
+        command.
+    """
+    intern = sys.intern
+    for line in input_file:
+        fields = line.split('//', 1)[0].split()
+        if not fields:
+            continue
+        opcode = OPCODES.get(fields[0], NO_COMMAND)
+        if opcode == C_ARITHMETIC:
+            arg1 = intern(fields[0])
+        elif opcode == C_RETURN or opcode == NO_COMMAND:
+            arg1 = None
+        else:
+            arg1 = intern(fields[1])
+        yield opcode, arg1, (int(fields[2]) if opcode in INT_ARGUMENT_OPCODES
+                             else None)
 
 class Parser:
     """
@@ -72,8 +131,61 @@ class Parser:
         self.current_line_index = -1
 
         self.input_lines = removing_comments(self.input_lines)
+        # the source line of every command, counting from 1, or None once
+        # an optimization pass rewrote the commands without keeping them
+        self.line_numbers = [number for number, line
+                             in enumerate(self.input_lines, 1)
+                             if line.strip()]
         self.input_lines = removing_whitespaces(self.input_lines)
 
+        # Every command is tokenized once into these parallel arrays, which
+        # are indexed like input_lines. Arguments that a command does not
+        # have are None.
+        self.opcodes = []
+        self.args1 = []
+        self.args2 = []
+        self.parse_commands()
+
+    def parse_commands(self) -> None:
+        """Fills the parallel command arrays from input_lines.
+
+        opcodes holds the opcode of each command, args1 its first argument
+        (the command itself for arithmetic commands), interned so that equal
+        names are the same object, and args2 its integer second argument.
+        """
+        opcodes, args1, args2 = self.opcodes, self.args1, self.args2
+        intern = sys.intern
+        for line in self.input_lines:
+            fields = line.split()
+            opcode = OPCODES.get(fields[0], NO_COMMAND)
+            opcodes.append(opcode)
+            if opcode == C_ARITHMETIC:
+                args1.append(intern(fields[0]))
+            elif opcode == C_RETURN or opcode == NO_COMMAND:
+                args1.append(None)
+            else:
+                args1.append(intern(fields[1]))
+            args2.append(int(fields[2]) if opcode in INT_ARGUMENT_OPCODES
+                         else None)
+
+    def replace_commands(
+            self, commands: typing.List[str],
+            line_numbers: typing.Optional[typing.List[int]] = None) -> None:
+        """Parses commands instead of the current ones, as an optimization
+        pass that rewrites the program does.
+
+        Args:
+            commands (typing.List[str]): commands without comments.
+            line_numbers (typing.Optional[typing.List[int]]): the source
+                line of every command, if the pass kept track of them.
+        """
+        self.input_lines = commands
+        self.line_numbers = line_numbers
+        self.opcodes = []
+        self.args1 = []
+        self.args2 = []
+        self.parse_commands()
+
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
 
@@ -105,40 +217,7 @@ class Parser:
             "C_RETURN", "C_CALL".
         """
         # Your code goes here!
-
-
-
-        if self.current_command.startswith("push"):
-            return "C_PUSH"
-
-        if self.current_command.startswith("pop"):
-            return "C_POP"
-
-        if self.current_command.startswith("label"):
-            return "C_LABEL"
-
-        if self.current_command.startswith("if-goto"):
-            return "C_IF"
-
-        if self.current_command.startswith("goto"):
-            return "C_GOTO"
-
-        if self.current_command.startswith("function"):
-            return "C_FUNCTION"
-
-        if self.current_command.startswith("return"):
-            return "C_RETURN"
-
-        if self.current_command.startswith("call"):
-            return "C_CALL"
-
-        self.current_command = self.input_lines[self.current_line_index].split(" ")[0]
-        if self.current_command in ["add", "sub", "neg", "eq", "and", "or", "not", "shiftleft", "shiftright", "gt",
-                                    "lt"]:
-            return "C_ARITHMETIC"
-
-
-
+        return COMMAND_TYPES[self.opcodes[self.current_line_index]]
 
     def arg1(self) -> str:
         """
@@ -148,14 +227,7 @@ class Parser:
             Should not be called if the current command is "C_RETURN".
         """
         # Your code goes here!
-
-        command = self.input_lines[self.current_line_index].split(" ")[0]
-        if command in ["add", "sub", "neg", "eq", "and", "or", "not", "shiftleft", "shiftright", "gt",
-                                    "lt"]:
-                return command
-
-        return self.input_lines[self.current_line_index].split(" ")[1]
-
+        return self.args1[self.current_line_index]
 
     def arg2(self) -> int:
         """
@@ -165,9 +237,5 @@ class Parser:
             "C_FUNCTION" or "C_CALL".
         """
         # Your code goes here!
-
-        command = self.input_lines[self.current_line_index].split(" ")[2]
-        x = int(command)
-
-        return x
+        return self.args2[self.current_line_index]
 
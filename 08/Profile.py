@@ -0,0 +1,226 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import csv
+import json
+import typing
+from Parser import Parser, COMMAND_TYPES, C_FUNCTION
+
+# The number of words in the ROM of the Hack computer.
+ROM_SIZE = 32768
+
+# Where instructions that belong to no function are counted, the first for
+# every file.
+OUTSIDE_FUNCTIONS = "(outside functions of {})"
+SHARED_ROUTINES = "(shared routines)"
+
+# The name of every opcode in the instruction mix, like "push" for C_PUSH.
+MIX_NAMES = tuple(command_type[2:].lower() if command_type else "other"
+                  for command_type in COMMAND_TYPES)
+
+
+class RomProfile:
+    """
+    The ROM words written for every VM function, as A- and C-instructions,
+    by the kind of VM command that wrote them and by source line. Writes go
+    through a ProfiledStream, which the translation loop tells where every
+    command starts.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty profile."""
+        # function -> its counters, see function_counters
+        self.functions = {}
+
+    def function_counters(self, function: str, file_name: str) -> dict:
+        """
+        Args:
+            function (str): a function name.
+            file_name (str): the .vm file the function is in.
+
+        Returns:
+            dict: the counters of the function, created if needed.
+        """
+        counters = self.functions.get(function)
+        if counters is None:
+            counters = self.functions[function] = {
+                "file": file_name, "words": 0, "a_instructions": 0,
+                "c_instructions": 0, "commands": 0, "mix": {}, "lines": {}}
+        return counters
+
+    def total_words(self) -> int:
+        """
+        Returns:
+            int: the ROM words of the whole program.
+        """
+        return sum(counters["words"] for counters in self.functions.values())
+
+    def merge(self, other: "RomProfile") -> None:
+        """Adds the counters of other to these.
+
+        Args:
+            other (RomProfile): a profile of other files.
+        """
+        for function, other_counters in other.functions.items():
+            counters = self.function_counters(function,
+                                              other_counters["file"])
+            for key in ("words", "a_instructions", "c_instructions",
+                        "commands"):
+                counters[key] += other_counters[key]
+            for field in ("mix", "lines"):
+                for key, words in other_counters[field].items():
+                    counters[field][key] = counters[field].get(key, 0) + words
+
+    def sorted_functions(self) -> typing.List[typing.Tuple[str, dict]]:
+        """
+        Returns:
+            typing.List[typing.Tuple[str, dict]]: (function, counters) pairs,
+            the largest function first.
+        """
+        return sorted(self.functions.items(),
+                      key=lambda item: (-item[1]["words"], item[0]))
+
+    def write_report(self, output_path: str) -> None:
+        """Writes the profile as CSV if output_path ends with ".csv", as JSON
+        otherwise.
+
+        Args:
+            output_path (str): the path of the report.
+        """
+        functions = self.sorted_functions()
+        if output_path.lower().endswith(".csv"):
+            with open(output_path, 'w', newline='') as output_file:
+                writer = csv.writer(output_file)
+                writer.writerow(["function", "file", "words", "a_instructions",
+                                 "c_instructions", "commands"] +
+                                ["mix_" + name for name in MIX_NAMES])
+                for function, counters in functions:
+                    writer.writerow(
+                        [function, counters["file"], counters["words"],
+                         counters["a_instructions"],
+                         counters["c_instructions"], counters["commands"]] +
+                        [counters["mix"].get(name, 0) for name in MIX_NAMES])
+            return
+        report = {
+            "total_words": self.total_words(),
+            "rom_size": ROM_SIZE,
+            "functions": [
+                {"function": function, **counters,
+                 "lines": {str(line): words for line, words
+                           in sorted(counters["lines"].items())}}
+                for function, counters in functions],
+        }
+        with open(output_path, 'w') as output_file:
+            output_file.write(json.dumps(report, indent=2) + '\n')
+
+    def overflow_message(self, largest: int = 10) -> typing.Optional[str]:
+        """
+        Args:
+            largest (int): the number of functions listed.
+
+        Returns:
+            typing.Optional[str]: None if the program fits in the ROM, a
+            breakdown of its largest functions otherwise.
+        """
+        total = self.total_words()
+        if total <= ROM_SIZE:
+            return None
+        lines = ["the program takes {} words, {} more than the {} of the "
+                 "ROM; the largest functions:".format(
+                     total, total - ROM_SIZE, ROM_SIZE)]
+        for function, counters in self.sorted_functions()[:largest]:
+            lines.append("  {:>6} words ({:.1%}) {} in {}".format(
+                counters["words"], counters["words"] / total, function,
+                counters["file"]))
+        return '\n'.join(lines)
+
+
+class ProfiledStream:
+    """
+    Passes everything written to an output stream and counts the
+    instructions in it for the command being translated.
+    """
+
+    def __init__(self, output_stream: typing.TextIO, profile: RomProfile,
+                 file_name: str,
+                 parser: typing.Optional[Parser] = None) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): receives everything written.
+            profile (RomProfile): receives the counts.
+            file_name (str): the file being translated.
+            parser (typing.Optional[Parser]): the parser of the file, None
+                for code that does not come from a file.
+        """
+        self.output_stream = output_stream
+        self.profile = profile
+        self.file_name = file_name
+        self.parser = parser
+        self.counters = profile.function_counters(
+            OUTSIDE_FUNCTIONS.format(file_name) if parser is not None
+            else SHARED_ROUTINES, file_name)
+        self.mix_name = "other"
+        self.line = None
+
+    def start(self, index: int) -> None:
+        """Counts what is written from now on for a command of the parser.
+
+        Args:
+            index (int): the index of the command in the parser.
+        """
+        parser = self.parser
+        opcode = parser.opcodes[index]
+        if opcode == C_FUNCTION:
+            self.counters = self.profile.function_counters(
+                parser.args1[index], self.file_name)
+        self.counters["commands"] += 1
+        self.mix_name = MIX_NAMES[opcode]
+        self.line = parser.line_numbers[index] \
+            if parser.line_numbers is not None else None
+
+    def write(self, text: str) -> int:
+        """
+        Args:
+            text (str): assembly, one command per line.
+
+        Returns:
+            int: the number of characters written.
+        """
+        a_instructions = c_instructions = 0
+        for line in text.split('\n'):
+            if not line or line[0] == '/' or line[0] == '(':
+                continue
+            if line[0] == '@':
+                a_instructions += 1
+            else:
+                c_instructions += 1
+        words = a_instructions + c_instructions
+        if words:
+            counters = self.counters
+            counters["words"] += words
+            counters["a_instructions"] += a_instructions
+            counters["c_instructions"] += c_instructions
+            mix = counters["mix"]
+            mix[self.mix_name] = mix.get(self.mix_name, 0) + words
+            if self.line is not None:
+                lines = counters["lines"]
+                lines[self.line] = lines.get(self.line, 0) + words
+        return self.output_stream.write(text)
+
+    def seekable(self) -> bool:
+        """
+        Returns:
+            bool: whether the output stream is seekable.
+        """
+        return self.output_stream.seekable()
+
+    def tell(self) -> int:
+        """
+        Returns:
+            int: the position in the output stream.
+        """
+        return self.output_stream.tell()
@@ -0,0 +1,178 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from Templates import count_instructions
+
+# How the locals of a function are zeroed:
+# "unrolled" - a push 0 for every local, as in the book.
+# "speed" - the shortest straight-line code, which is also the fastest.
+# "size" - like "speed", but functions with more locals than a threshold
+#          call a shared routine instead.
+PROLOGUE_POLICIES = ("unrolled", "speed", "size")
+
+# Default number of locals above which the "size" policy calls the routine.
+DEFAULT_ROUTINE_THRESHOLD = 8
+
+ZERO_ROUTINE_LABEL = "VM$ZERO"
+
+# Shared routine that pushes D zeros, D > 0, and returns to the address in
+# R15. Written once per program when a function calls it.
+ZERO_ROUTINE = (
+    "(VM$ZERO)\n"
+    "@SP\n"
+    "AM=M+1\n"
+    "A=A-1\n"
+    "M=0\n"
+    "D=D-1\n"
+    "@VM$ZERO\n"
+    "D;JGT\n"
+    "@R15\n"
+    "A=M\n"
+    "0;JMP\n")
+
+# Instructions of a single turn of the loop of the routine and of its
+# return, for the cycles in the report.
+ZERO_LOOP_CYCLES = 7
+ZERO_RETURN_CYCLES = 3
+
+
+class PrologueWriter:
+    """
+    Writes the code that zeroes the locals of a function after its label.
+    The unrolled prologue of the book takes 5 instructions for every local.
+    A bulk prologue walks A over the locals, storing 0 in each, and moves SP
+    once at the end, which takes 2 instructions per local and 4 more. The
+    shared routine takes a loop turn per local but only 8 instructions at
+    every function.
+    """
+
+    def __init__(self, policy: str = "speed",
+                 threshold: int = DEFAULT_ROUTINE_THRESHOLD) -> None:
+        """
+        Args:
+            policy (str): one of PROLOGUE_POLICIES.
+            threshold (int): with the "size" policy, functions with more
+                locals call the shared routine.
+        """
+        if policy not in PROLOGUE_POLICIES:
+            raise ValueError("unknown prologue policy: " + policy)
+        self.policy = policy
+        self.threshold = threshold
+        # True once a prologue calls ZERO_ROUTINE
+        self.routine_used = False
+        # form -> [functions, instructions, cycles, unrolled instructions]
+        self.costs = {}
+
+    @staticmethod
+    def unrolled(n_vars: int) -> str:
+        """
+        Args:
+            n_vars (int): the number of locals.
+
+        Returns:
+            str: a push 0 for every local.
+        """
+        return "@SP\nA=M\nM=0\n@SP\nM=M+1\n" * n_vars
+
+    @staticmethod
+    def bulk(n_vars: int) -> str:
+        """
+        Args:
+            n_vars (int): the number of locals, at least 1.
+
+        Returns:
+            str: straight-line code that zeroes the locals and moves SP once.
+        """
+        return "@SP\nA=M\n" + "M=0\nA=A+1\n" * (n_vars - 1) + \
+            "M=0\nD=A+1\n@SP\nM=D\n"
+
+    @staticmethod
+    def routine_call(function_name: str, n_vars: int) -> str:
+        """
+        Args:
+            function_name (str): the function, whose name makes the return
+                label unique.
+            n_vars (int): the number of locals, at least 1.
+
+        Returns:
+            str: a call of ZERO_ROUTINE.
+        """
+        # VM labels cannot contain "$", so this never meets a label of the
+        # function
+        return_label = function_name + "$$zeroed"
+        return "@" + return_label + "\nD=A\n@R15\nM=D\n@" + str(n_vars) + \
+            "\nD=A\n@" + ZERO_ROUTINE_LABEL + "\n0;JMP\n(" + return_label + \
+            ")\n"
+
+    def prologue(self, function_name: str, n_vars: int) -> str:
+        """
+        Args:
+            function_name (str): the function.
+            n_vars (int): the number of locals of the function.
+
+        Returns:
+            str: the code that zeroes the locals, chosen by the policy.
+        """
+        if n_vars == 0:
+            return ""
+        unrolled = self.unrolled(n_vars)
+        if self.policy == "size" and n_vars > self.threshold:
+            form, code = "routine", self.routine_call(function_name, n_vars)
+            self.routine_used = True
+        elif self.policy == "unrolled":
+            form, code = "unrolled", unrolled
+        else:
+            form, code = min((("unrolled", unrolled),
+                              ("bulk", self.bulk(n_vars))),
+                             key=lambda item: count_instructions(item[1]))
+        instructions = count_instructions(code)
+        cycles = instructions if form != "routine" else \
+            instructions + n_vars * ZERO_LOOP_CYCLES + ZERO_RETURN_CYCLES
+        costs = self.costs.setdefault(form, [0, 0, 0, 0])
+        costs[0] += 1
+        costs[1] += instructions
+        costs[2] += cycles
+        costs[3] += count_instructions(unrolled)
+        return code
+
+    def merge(self, other: "PrologueWriter") -> None:
+        """Adds the counters of other to these.
+
+        Args:
+            other (PrologueWriter): a writer that translated other files.
+        """
+        self.routine_used = self.routine_used or other.routine_used
+        for form, other_costs in other.costs.items():
+            costs = self.costs.setdefault(form, [0, 0, 0, 0])
+            for index, amount in enumerate(other_costs):
+                costs[index] += amount
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the instructions and cycles of the prologues against the
+            unrolled ones, in total and for every form.
+        """
+        lines = []
+        total, cycles_total, unrolled_total = 0, 0, 0
+        for form in sorted(self.costs):
+            functions, instructions, cycles, unrolled = self.costs[form]
+            total += instructions
+            cycles_total += cycles
+            unrolled_total += unrolled
+            lines.append("{} prologues: {} functions, {} instructions, {} "
+                         "cycles, {} unrolled".format(
+                             form, functions, instructions, cycles,
+                             unrolled))
+        lines.insert(0, "prologues ({}): {} instructions, {} cycles, {} "
+                        "unrolled, {} saved".format(
+                            self.policy, total, cycles_total, unrolled_total,
+                            unrolled_total - total))
+        if self.routine_used:
+            lines.append("zero routine: {} instructions".format(
+                count_instructions(ZERO_ROUTINE)))
+        return '\n'.join(lines)
@@ -0,0 +1,76 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# Number of characters BufferedStream holds before writing them out.
+BUFFER_SIZE = 256 * 1024
+
+
+class BufferedStream:
+    """
+    Collects the many small strings CodeWriter writes for every command and
+    writes them to the output stream joined, in chunks of about BUFFER_SIZE
+    characters, so the output stream sees few large writes and the buffer
+    never grows with the program.
+    """
+
+    def __init__(self, output_stream: typing.TextIO,
+                 buffer_size: int = BUFFER_SIZE) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): receives everything written.
+            buffer_size (int): the characters held before they are written.
+        """
+        self.output_stream = output_stream
+        self.buffer_size = buffer_size
+        self.chunk = []
+        # characters in chunk
+        self.size = 0
+        # characters and writes passed to the output stream
+        self.characters_written = 0
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        """
+        Args:
+            text (str): assembly.
+
+        Returns:
+            int: the number of characters written.
+        """
+        self.chunk.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        """Writes the buffered text to the output stream."""
+        if not self.chunk:
+            return
+        self.output_stream.write(''.join(self.chunk))
+        self.characters_written += self.size
+        self.writes += 1
+        self.chunk = []
+        self.size = 0
+
+    def seekable(self) -> bool:
+        """
+        Returns:
+            bool: whether the output stream is seekable.
+        """
+        return self.output_stream.seekable()
+
+    def tell(self) -> int:
+        """Writes the buffered text, so the position is up to date.
+
+        Returns:
+            int: the position in the output stream.
+        """
+        self.flush()
+        return self.output_stream.tell()
@@ -0,0 +1,170 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# Pushes D.
+PUSH_TAIL = "@SP\nM=M+1\nA=M-1\nM=D\n"
+# Pops into D, leaving A at the popped cell.
+POP_HEAD = "@SP\nAM=M-1\nD=M\n"
+
+# Base pointers of the segments that are addressed through one.
+BASE_POINTERS = {"local": "LCL", "argument": "ARG", "this": "THIS",
+                 "that": "THAT"}
+# First address of the segments that are at a fixed place.
+FIXED_SEGMENTS = {"pointer": 3, "temp": 5}
+
+# Instructions of the generic templates of CodeWriter.write_push_pop, by
+# command and segment, which the report compares against.
+GENERIC_COSTS = {
+    ("C_PUSH", "constant"): 7, ("C_PUSH", "static"): 7,
+    ("C_PUSH", "local"): 11, ("C_PUSH", "argument"): 11,
+    ("C_PUSH", "this"): 11, ("C_PUSH", "that"): 11,
+    ("C_PUSH", "temp"): 10, ("C_PUSH", "pointer"): 10,
+    ("C_POP", "static"): 7,
+    ("C_POP", "local"): 13, ("C_POP", "argument"): 13,
+    ("C_POP", "this"): 13, ("C_POP", "that"): 13,
+    ("C_POP", "temp"): 13, ("C_POP", "pointer"): 13,
+}
+
+
+def count_instructions(code: str) -> int:
+    """
+    Args:
+        code (str): assembly, one command per line.
+
+    Returns:
+        int: the instructions in code, without comments and labels.
+    """
+    return sum(1 for line in code.split('\n')
+               if line and line[0] != '/' and line[0] != '(')
+
+
+class TemplateEngine:
+    """
+    Chooses the code of every push and pop from a few candidate sequences,
+    by the number of instructions each one takes. Small indices of the
+    segments behind a base pointer are reached by incrementing A, which
+    keeps D free, so pops do not need a scratch register for them, and
+    fixed addresses are used as they are.
+    """
+
+    def __init__(self) -> None:
+        """Creates an engine with empty counters."""
+        # (command, segment, index) -> the chosen code, for all segments
+        # but static, whose code depends on the file
+        self.templates = {}
+        # (command, segment) -> [commands, instructions, generic
+        # instructions]
+        self.costs = {}
+
+    def push_pop(self, command: str, segment: str, index: int,
+                 file_name: str) -> str:
+        """
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+            file_name (str): the name static variables are prefixed with.
+
+        Returns:
+            str: the cheapest code of the command.
+        """
+        key = (command, segment, index)
+        code = self.templates.get(key)
+        if code is None:
+            code = min(self.candidates(command, segment, index, file_name),
+                       key=count_instructions)
+            if segment != "static":
+                self.templates[key] = code
+        costs = self.costs.get((command, segment))
+        if costs is None:
+            costs = self.costs[(command, segment)] = [0, 0, 0]
+        costs[0] += 1
+        costs[1] += count_instructions(code)
+        costs[2] += GENERIC_COSTS[(command, segment)]
+        return code
+
+    @staticmethod
+    def candidates(command: str, segment: str, index: int,
+                   file_name: str) -> typing.List[str]:
+        """
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+            file_name (str): the name static variables are prefixed with.
+
+        Returns:
+            typing.List[str]: every sequence that translates the command.
+        """
+        comment = "//" + ("push " if command == "C_PUSH" else "pop ") + \
+            segment + " " + str(index) + "\n"
+        if segment == "constant":
+            result = [comment + "@" + str(index) + "\nD=A\n" + PUSH_TAIL]
+            if index <= 1:
+                result.append(comment + "@SP\nM=M+1\nA=M-1\nM=" +
+                              str(index) + "\n")
+            return result
+        if segment == "static":
+            address = "@" + file_name + "." + str(index) + "\n"
+        elif segment in FIXED_SEGMENTS:
+            address = "@" + str(FIXED_SEGMENTS[segment] + index) + "\n"
+        else:
+            address = None
+        if address is not None:
+            if command == "C_PUSH":
+                return [comment + address + "D=M\n" + PUSH_TAIL]
+            return [comment + POP_HEAD + address + "M=D\n"]
+
+        base = "@" + BASE_POINTERS[segment] + "\n"
+        # A = base + index without touching D
+        if index == 0:
+            stepped = base + "A=M\n"
+        else:
+            stepped = base + "A=M+1\n" + "A=A+1\n" * (index - 1)
+        if command == "C_PUSH":
+            return [comment + stepped + "D=M\n" + PUSH_TAIL,
+                    comment + base + "D=M\n@" + str(index) +
+                    "\nA=D+A\nD=M\n" + PUSH_TAIL]
+        return [comment + POP_HEAD + stepped + "M=D\n",
+                comment + base + "D=M\n@" + str(index) + "\nD=D+A\n"
+                "@R13\nM=D\n" + POP_HEAD + "@R13\nA=M\nM=D\n"]
+
+    def merge(self, other: "TemplateEngine") -> None:
+        """Adds the counters of other to these.
+
+        Args:
+            other (TemplateEngine): an engine that translated other files.
+        """
+        for key, (commands, instructions, generic) in other.costs.items():
+            costs = self.costs.setdefault(key, [0, 0, 0])
+            costs[0] += commands
+            costs[1] += instructions
+            costs[2] += generic
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the instructions of the chosen templates and of the generic
+            ones, in total and for every command and segment.
+        """
+        lines = []
+        total, generic_total = 0, 0
+        for command, segment in sorted(self.costs):
+            commands, instructions, generic = self.costs[(command, segment)]
+            total += instructions
+            generic_total += generic
+            lines.append("{} {}: {} commands, {} instructions, {} generic"
+                         .format(command[2:].lower(), segment, commands,
+                                 instructions, generic))
+        saved = generic_total - total
+        lines.insert(0, "push/pop: {} instructions, {} generic, {} saved "
+                        "({:.1%})".format(total, generic_total, saved,
+                                          saved / generic_total
+                                          if generic_total else 0))
+        return '\n'.join(lines)
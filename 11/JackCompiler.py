@@ -5,32 +5,48 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
 import os
-import sys
 import typing
 from CompilationEngine import CompilationEngine
 from JackTokenizer import JackTokenizer
+from Stats import Stats, write_report
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
 
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        stats: typing.Optional[Stats] = None) -> None:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
         output_file (typing.TextIO): writes all output to this file.
+        stats (typing.Optional[Stats]): if given, collects the time of the
+            tokenize and compile phases and the compilation counters.
     """
     # Your code goes here!
     # This function should be relatively similar to "analyze_file" in
     # JackAnalyzer.py from the previous project.
 
+    # the engine tokenizes the whole input when it is created
+    if stats is not None:
+        stats.start("tokenize")
     engine = CompilationEngine(input_file, output_file)
 
     # comiple the class
+    if stats is not None:
+        stats.start("compile")
     engine.classCompile()
 
+    if stats is not None:
+        stats.end()
+        stats.count("tokens", len(engine.tokenizer.tokens))
+        stats.count("labels", engine.labelCounter - 1)
+        if output_file.seekable():
+            stats.count("bytes_written", output_file.tell())
+
     # closing output file
     output_file.close()
 
@@ -40,9 +56,17 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="JackCompiler")
+    arg_parser.add_argument("input_path", help="a .jack file or a directory")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="print per-phase times and counters as JSON")
+    arg_parser.add_argument(
+        "--stats-file", metavar="PATH",
+        help="write the --stats report to PATH instead of printing it")
+    args = arg_parser.parse_args()
+    stats_by_file = {} if args.stats or args.stats_file else None
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
@@ -54,6 +78,11 @@ if "__main__" == __name__:
         if extension.lower() != ".jack":
             continue
         output_path = filename + ".vm"
+        stats = None
+        if stats_by_file is not None:
+            stats = stats_by_file[input_path] = Stats()
         with open(input_path, 'r') as input_file, \
                 open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+            compile_file(input_file, output_file, stats)
+    if stats_by_file is not None:
+        write_report("jack_compiler", stats_by_file, args.stats_file or "-")
@@ -0,0 +1,107 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import time
+import typing
+
+
+class Stats:
+    """
+    Wall time per phase and counters of a build, reported by --stats.
+    Tools take an optional Stats object and only touch it at phase
+    boundaries, so passing None costs nothing.
+    """
+
+    def __init__(self) -> None:
+        """Creates empty statistics."""
+        self.phases = {}
+        self.counters = {}
+        self.phase_name = None
+        self.phase_start = 0.0
+
+    def start(self, phase: str) -> None:
+        """Ends the current phase, if any, and starts timing a new one.
+
+        Args:
+            phase (str): the name of the phase.
+        """
+        now = time.perf_counter()
+        self.end(now)
+        self.phase_name = phase
+        self.phase_start = now
+
+    def end(self, now: typing.Optional[float] = None) -> None:
+        """Ends the current phase, adding its time to the phase total.
+
+        Args:
+            now (typing.Optional[float]): the current perf_counter() value.
+        """
+        if self.phase_name is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+        self.phases[self.phase_name] = \
+            self.phases.get(self.phase_name, 0.0) + now - self.phase_start
+        self.phase_name = None
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        """
+        Args:
+            counter (str): the name of the counter.
+            amount (int): added to the counter.
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, other: "Stats") -> None:
+        """Adds the phase times and counters of other to these.
+
+        Args:
+            other (Stats): statistics of another build.
+        """
+        for phase, seconds in other.phases.items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        for counter, amount in other.counters.items():
+            self.count(counter, amount)
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: the phase times in seconds and the counters.
+        """
+        self.end()
+        return {
+            "phases": {phase: round(seconds, 6)
+                       for phase, seconds in self.phases.items()},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+def write_report(tool: str, stats_by_file: typing.Dict[str, Stats],
+                 output_path: str) -> None:
+    """Writes the statistics of every file and their total as JSON.
+
+    Args:
+        tool (str): the name of the tool.
+        stats_by_file (typing.Dict[str, Stats]): statistics of every input.
+        output_path (str): path of the report, "-" for standard output.
+    """
+    total = Stats()
+    for stats in stats_by_file.values():
+        total.merge(stats)
+    report = {
+        "tool": tool,
+        "total": total.report(),
+        "files": {path: stats_by_file[path].report()
+                  for path in sorted(stats_by_file)},
+    }
+    text = json.dumps(report, indent=2)
+    if output_path == "-":
+        print(text)
+    else:
+        with open(output_path, 'w') as output_file:
+            output_file.write(text + '\n')
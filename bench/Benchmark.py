@@ -0,0 +1,332 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Throughput benchmark of the toolchain: the assembler (06), the VM translator
+(08) and the Jack compiler (11). Synthetic inputs are generated, every stage
+runs through its public entry point in a fresh process, and the results are
+reported as JSON.
+
+Usage: python3 Benchmark.py [--scale N] [--repeat N] [--output report.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stage -> (project directory, module, entry point, input extension)
+STAGES = {
+    "assembler": ("06", "Main", "assemble_file", ".asm"),
+    "vm_translator": ("08", "Main", "translate_file", ".vm"),
+    "jack_compiler": ("11", "JackCompiler", "compile_file", ".jack"),
+}
+
+VM_COMPARISONS = ("eq", "gt", "lt")
+VM_ARITHMETIC = ("add", "sub", "and", "or", "neg", "not")
+VM_SEGMENTS = ("local", "argument", "this", "that", "temp", "static")
+
+
+def generate_asm(scale: int, rng: random.Random) -> str:
+    """
+    Args:
+        scale (int): the size of the program, in blocks of about 25 lines.
+        rng (random.Random): source of randomness.
+
+    Returns:
+        str: Hack assembly with many labels, variables and forward jumps.
+    """
+    lines = []
+    for block in range(scale):
+        lines.append("// block {}".format(block))
+        lines.append("(BLOCK_{})".format(block))
+        for _ in range(4):
+            lines.append("@var_{}".format(rng.randrange(scale)))
+            lines.append(rng.choice(("D=M", "M=D", "AM=M+1", "D=D+M")))
+            lines.append("@{}".format(rng.randrange(32768)))
+            lines.append(rng.choice(("D=A", "D=D-A", "A=D+A", "M=D|M")))
+        lines.append("@BLOCK_{}".format(rng.randrange(scale)))
+        lines.append("D;JGT")
+        lines.append("@LOOP_{}".format(block))
+        lines.append("0;JMP   // jump over the loop body")
+        lines.append("(LOOP_{})".format(block))
+        lines.append("@SP")
+        lines.append("M=M-1")
+    lines.append("(END)")
+    lines.append("@END")
+    lines.append("0;JMP")
+    return '\n'.join(lines) + '\n'
+
+
+def generate_vm(scale: int, rng: random.Random) -> str:
+    """
+    Args:
+        scale (int): the size of the program, in functions of about 60
+            commands.
+        rng (random.Random): source of randomness.
+
+    Returns:
+        str: VM code heavy on eq/gt/lt and function calls.
+    """
+    lines = ["function Sys.init 0", "call Bench.f0 0", "pop temp 0",
+             "label HALT", "goto HALT"]
+    for function in range(scale):
+        lines.append("function Bench.f{} 4".format(function))
+        for step in range(8):
+            lines.append("push argument 0")
+            lines.append("push constant {}".format(rng.randrange(32768)))
+            lines.append(rng.choice(VM_COMPARISONS))
+            lines.append("if-goto SKIP{}".format(step))
+            lines.append("push {} {}".format(rng.choice(VM_SEGMENTS),
+                                             rng.randrange(4)))
+            lines.append("push local {}".format(rng.randrange(4)))
+            lines.append(rng.choice(VM_ARITHMETIC + VM_COMPARISONS))
+            lines.append("pop local {}".format(rng.randrange(4)))
+            lines.append("push local {}".format(rng.randrange(4)))
+            lines.append("call Bench.f{} 1".format(rng.randrange(scale)))
+            lines.append("pop static {}".format(rng.randrange(8)))
+            lines.append("label SKIP{}".format(step))
+        lines.append("push local 0")
+        lines.append("return")
+    return '\n'.join(lines) + '\n'
+
+
+def generate_jack_statements(depth: int, rng: random.Random,
+                             indent: str) -> typing.List[str]:
+    """
+    Args:
+        depth (int): how many more levels of if/while to nest.
+        rng (random.Random): source of randomness.
+        indent (str): indentation of the statements.
+
+    Returns:
+        typing.List[str]: lines of Jack statements.
+    """
+    lines = [
+        indent + "let t = t + (i * {}) - (a / 3);".format(rng.randrange(100)),
+        indent + "let arr[i] = arr[i + 1] + Bench.helper(i, t);",
+    ]
+    if depth == 0:
+        lines.append(indent + "do Output.printInt(t);")
+        return lines
+    inner = indent + "    "
+    if rng.random() < 0.5:
+        lines.append(indent + "if ((i > {}) & ~(t = 0)) {{".format(
+            rng.randrange(50)))
+        lines += generate_jack_statements(depth - 1, rng, inner)
+        lines.append(indent + "} else {")
+        lines += generate_jack_statements(depth - 1, rng, inner)
+        lines.append(indent + "}")
+    else:
+        lines.append(indent + "while (i < {}) {{".format(rng.randrange(50)))
+        lines += generate_jack_statements(depth - 1, rng, inner)
+        lines.append(inner + "let i = i + 1;")
+        lines.append(indent + "}")
+    return lines
+
+
+def generate_jack(scale: int, rng: random.Random) -> str:
+    """
+    Args:
+        scale (int): the size of the class, in subroutines.
+        rng (random.Random): source of randomness.
+
+    Returns:
+        str: a Jack class whose subroutines nest if and while statements
+        several levels deep.
+    """
+    lines = ["/** Generated by Benchmark.py. */", "class Bench {",
+             "    field int a, b;", "    static int count;", "",
+             "    constructor Bench new(int x) {", "        let a = x;",
+             "        let b = x + 1;", "        return this;", "    }", "",
+             "    function int helper(int x, int y) {",
+             "        return (x + y) * 2;", "    }"]
+    for subroutine in range(scale):
+        lines.append("")
+        lines.append("    method int run{}(int i, Array arr) {{".format(
+            subroutine))
+        lines.append("        var int t;")
+        lines.append("        let t = {};".format(rng.randrange(1000)))
+        lines += generate_jack_statements(5, rng, "        ")
+        lines.append("        return t;")
+        lines.append("    }")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+GENERATORS = {
+    "assembler": generate_asm,
+    "vm_translator": generate_vm,
+    "jack_compiler": generate_jack,
+}
+
+# The scale of each stage's input relative to --scale, chosen so that each
+# stage runs for a comparable time.
+SCALE_FACTORS = {"assembler": 400, "vm_translator": 40, "jack_compiler": 6}
+
+
+def count_jack_tokens(jack_compiler_directory: str, input_path: str) -> int:
+    """
+    Args:
+        jack_compiler_directory (str): the directory of JackTokenizer.py.
+        input_path (str): a .jack file.
+
+    Returns:
+        int: the number of tokens in the file.
+    """
+    sys.path.insert(0, jack_compiler_directory)
+    from JackTokenizer import JackTokenizer
+    with open(input_path, 'r') as input_file:
+        return len(JackTokenizer(input_file).tokens)
+
+
+def peak_rss_kb() -> int:
+    """
+    Returns:
+        int: the peak resident set size of this process, in kilobytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_stage(stage: str, input_path: str, repeat: int) -> dict:
+    """Runs one stage on input_path in this process. Called in a fresh
+    process by measure_stage, so that the modules of the different projects
+    (which share names like Main and Parser) never meet.
+
+    Args:
+        stage (str): one of the keys of STAGES.
+        input_path (str): the generated input of the stage.
+        repeat (int): how many times to run the stage, the best is reported.
+
+    Returns:
+        dict: the measurements of the stage.
+    """
+    directory, module_name, entry_point, _ = STAGES[stage]
+    project_directory = os.path.join(ROOT, directory)
+    sys.path.insert(0, project_directory)
+    entry = getattr(__import__(module_name), entry_point)
+    with open(input_path, 'r') as input_file:
+        lines = sum(1 for line in input_file if line.strip())
+
+    seconds = []
+    for _ in range(repeat):
+        output_path = input_path + ".out"
+        with open(input_path, 'r') as input_file, \
+                open(output_path, 'w') as output_file:
+            start = time.perf_counter()
+            if stage == "vm_translator":
+                entry(input_file, output_file, True)
+            else:
+                entry(input_file, output_file)
+            seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+
+    result = {
+        "input_lines": lines,
+        "input_bytes": os.path.getsize(input_path),
+        "output_bytes": os.path.getsize(output_path),
+        "seconds": round(best, 6),
+        "lines_per_sec": round(lines / best),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    if stage == "jack_compiler":
+        tokens = count_jack_tokens(project_directory, input_path)
+        result["tokens"] = tokens
+        result["tokens_per_sec"] = round(tokens / best)
+    return result
+
+
+def measure_stage(stage: str, input_path: str, repeat: int) -> dict:
+    """
+    Args:
+        stage (str): one of the keys of STAGES.
+        input_path (str): the generated input of the stage.
+        repeat (int): how many times to run the stage.
+
+    Returns:
+        dict: the measurements of the stage, taken in a child process.
+    """
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage,
+         input_path, "--repeat", str(repeat)],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return json.loads(completed.stdout)
+
+
+def benchmark(scale: int, repeat: int, seed: int,
+              stages: typing.List[str]) -> dict:
+    """Generates the inputs and measures the given stages.
+
+    Args:
+        scale (int): the size of the generated inputs.
+        repeat (int): how many times to run each stage.
+        seed (int): seed of the input generators.
+        stages (typing.List[str]): keys of STAGES to measure.
+
+    Returns:
+        dict: the report.
+    """
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "repeat": repeat,
+        "seed": seed,
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="hack-bench") as directory:
+        for stage in stages:
+            rng = random.Random(seed)
+            extension = STAGES[stage][3]
+            # the compiler names its output after the class, so the input
+            # must be called Bench too
+            input_path = os.path.join(directory, "Bench" + extension)
+            with open(input_path, 'w') as input_file:
+                input_file.write(GENERATORS[stage](
+                    scale * SCALE_FACTORS[stage], rng))
+            report["stages"][stage] = measure_stage(stage, input_path, repeat)
+    return report
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="Benchmark")
+    arg_parser.add_argument(
+        "--scale", type=int, default=10,
+        help="size of the generated inputs (default: %(default)s)")
+    arg_parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="runs per stage, the fastest is reported (default: "
+             "%(default)s)")
+    arg_parser.add_argument("--seed", type=int, default=2024)
+    arg_parser.add_argument(
+        "--stage", action="append", choices=STAGES,
+        help="stage to measure, may be repeated (default: all)")
+    arg_parser.add_argument("--output", help="write the report to this file")
+    arg_parser.add_argument("--run-stage", nargs=2,
+                            metavar=("STAGE", "INPUT"),
+                            help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage[0], args.run_stage[1],
+                                   args.repeat)))
+        sys.exit(0)
+    report = benchmark(args.scale, args.repeat, args.seed,
+                       args.stage or list(STAGES))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text + '\n')
+    print(text)